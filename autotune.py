@@ -0,0 +1,123 @@
+# Relay feedback autotuning of the PID gains
+# the heater is switched between bias+amplitude and bias-amplitude duty each time the temperature
+# crosses the setpoint (with a little hysteresis). The plate settles into an oscillation whose
+# period is the ultimate period Pu, and whose size gives the ultimate gain
+#   Ku = 4 * amplitude / (pi * sqrt(a^2 - hysteresis^2))    a = half the peak to peak swing
+# the PID gains come from Ku and Pu and are saved for the next PidController (pidcontrol.saveGains)
+#
+#   import autotune
+#   autotune.autotune(350)
+
+import math
+import clocks
+import control
+import pidcontrol
+
+# gain rules: kp = Ku / kpdiv, Ti = Pu * timult, Td = Pu * tdmult
+RULES = { 'ziegler-nichols' : (1 / 0.6, 0.5, 0.125),
+          'tyreus-luyben' : (2.2, 2.2, 1 / 6.3) }
+
+class RelayTuner():
+    ''' the relay and the oscillation measurement, fed one temperature at a time '''
+    def __init__(self, setpoint, bias, amplitude, hysteresis=1.0):
+        self.setpoint = setpoint
+        self.bias = bias
+        self.amplitude = amplitude
+        self.hysteresis = hysteresis
+        self.high = True            # the relay starts on the high side to heat to the setpoint
+        self.extreme = None         # highest/lowest temperature in this half cycle
+        self.peaks = []             # (time, temperature) of the highs
+        self.troughs = []           # (time, temperature) of the lows
+        self.switches = 0
+
+    def duty(self):
+        return max(0.0, min(100.0, self.bias + (self.amplitude if self.high else -self.amplitude)))
+
+    def update(self, temp, now):
+        ''' a new sample, returns the heater duty '''
+        if self.extreme is None or (temp < self.extreme[1] if self.high else temp > self.extreme[1]):
+            self.extreme = (now, temp)
+        if self.high and temp > self.setpoint + self.hysteresis:
+            self.high = False
+            if self.switches:
+                self.troughs.append(self.extreme)
+            self.switches += 1
+            self.extreme = (now, temp)
+        elif not self.high and temp < self.setpoint - self.hysteresis:
+            self.high = True
+            self.peaks.append(self.extreme)
+            self.switches += 1
+            self.extreme = (now, temp)
+        return self.duty()
+
+    def cycles(self):
+        return min(len(self.peaks), len(self.troughs))
+
+    def ultimate(self, count=2):
+        ''' (Ku, Pu) from the last count cycles, or None if there aren't enough yet '''
+        if self.cycles() < count + 1:
+            return None
+        peaks = self.peaks[-count - 1:]
+        troughs = self.troughs[-count:]
+        period = (peaks[-1][0] - peaks[0][0]) / count
+        swing = (sum(p[1] for p in peaks[1:]) / count - sum(t[1] for t in troughs) / count) / 2
+        swing = math.sqrt(max(swing ** 2 - self.hysteresis ** 2, 1e-6))
+        return (4 * self.amplitude / (math.pi * swing), period)
+
+    def settled(self, tolerance=0.1):
+        ''' True when the last two periods agree within tolerance '''
+        if len(self.peaks) < 3:
+            return False
+        p1 = self.peaks[-1][0] - self.peaks[-2][0]
+        p2 = self.peaks[-2][0] - self.peaks[-3][0]
+        return abs(p1 - p2) <= tolerance * max(p1, p2)
+
+def gains(ku, pu, rule='tyreus-luyben'):
+    ''' (kp, ki, kd) from the ultimate gain and period '''
+    (kpdiv, timult, tdmult) = RULES[rule]
+    kp = ku / kpdiv
+    return (kp, kp / (pu * timult), kp * pu * tdmult)
+
+def autotune(setpoint, clock=None, amplitude=20.0, bias=None, hysteresis=1.0, cycles=3,
+             rule='tyreus-luyben', limit=3600, save=True, path=pidcontrol.GAINS_FILE):
+    ''' run the relay test around setpoint (F) and return (kp, ki, kd), saving them if save is set
+        bias defaults to the feedforward steady duty at the setpoint
+    '''
+    clock = clock if clock is not None else clocks.CLOCK
+    if bias is None:
+        bias = pidcontrol.Feedforward().steady(setpoint)
+    tuner = RelayTuner(setpoint, bias, amplitude, hysteresis)
+    trun = control.TempRunner(clock)
+    rdr = control.Reader(clock)
+    trun.setCycle(100, 1)   # get there quickly
+    trun.start()
+    started = clock.time()
+    result = None
+    position = 0
+    try:
+        while clock.time() - started < limit:
+            clock.sleep(.1)
+            temp = rdr.readtemp()
+            now = clock.time()
+            duty = tuner.update(temp, now) if (tuner.switches or temp >= setpoint) else 100
+            if duty != trun.percent:
+                trun.setCycle(duty, 1)
+            position = position + 1
+            rdr.printduty(position, now - started, temp, duty)
+            if tuner.cycles() > cycles and tuner.settled():
+                result = tuner.ultimate(cycles)
+                break
+    finally:
+        trun.setCycle(0, 1)
+        trun.stop()
+        clock.join(trun)
+        rdr.close()
+    if result is None:
+        print("No steady oscillation, the gains are unchanged.")
+        return None
+    (ku, pu) = result
+    tuned = gains(ku, pu, rule)
+    print("Ku {0:.2f} Pu {1:.1f} s -> kp {2:.3f} ki {3:.4f} kd {4:.2f}".format(ku, pu, *tuned))
+    if save:
+        pidcontrol.saveGains(tuned, path)
+    return tuned
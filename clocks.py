@@ -0,0 +1,147 @@
+import time
+import threading
+
+# The clocks used by the control loops
+# everything that sleeps or reads the time goes through one of these so a run can
+# use the wall clock (RealClock) or a simulated one (VirtualClock) that runs as
+# fast as the code does
+
+class RealClock():
+    ''' the wall clock '''
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def event(self):
+        ''' an event that wait() can be woken by '''
+        return threading.Event()
+
+    def wait(self, event, seconds):
+        ''' sleep until the event is set or the time is up, returns True if the event is set '''
+        return event.wait(seconds)
+
+    def attach(self):
+        ''' a thread that will use this clock is about to start '''
+        pass
+
+    def detach(self):
+        ''' a thread using this clock is done '''
+        pass
+
+    def join(self, thread):
+        ''' wait for a thread to finish '''
+        thread.join()
+
+class VirtualEvent():
+    ''' a threading.Event lookalike that wakes VirtualClock.wait() '''
+    def __init__(self, clock):
+        self.clock = clock
+        self.flag = False
+        self.waiters = set()    # sleeper tokens waiting on this event
+
+    def is_set(self):
+        return self.flag
+
+    def set(self):
+        with self.clock.cond:
+            self.flag = True
+            # the waiters are due now so time can't move on before they run
+            for token in self.waiters:
+                self.clock.deadlines[token] = self.clock.now
+            self.clock.cond.notify_all()
+
+    def clear(self):
+        with self.clock.cond:
+            self.flag = False
+
+class VirtualClock():
+    ''' simulated time shared by a set of threads.
+        time only moves when every attached thread is sleeping, then it jumps to the
+        earliest wake up. The creating thread is attached, call attach() before starting
+        any other thread that sleeps on this clock and detach() when it ends.
+    '''
+    JOINSTEP = 0.001    # how often join() looks at the thread, in simulated seconds
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.cond = threading.Condition()
+        self.actors = 1
+        self.deadlines = { }     # wake up time by sleeper
+        self.listeners = [ ]     # called with (old, new) before time moves to new
+        self.steps = 0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self.cond:
+            token = object()
+            deadline = self.now + max(seconds, 0)
+            self.deadlines[token] = deadline
+            self._advance()
+            while self.now < deadline:
+                self.cond.wait()
+            del self.deadlines[token]
+
+    def event(self):
+        return VirtualEvent(self)
+
+    def wait(self, event, seconds):
+        with self.cond:
+            if event.flag:
+                return True
+            token = object()
+            deadline = self.now + max(seconds, 0)
+            self.deadlines[token] = deadline
+            event.waiters.add(token)
+            self._advance()
+            while self.now < deadline and not event.flag:
+                self.cond.wait()
+            event.waiters.discard(token)
+            del self.deadlines[token]
+            return event.flag
+
+    def attach(self):
+        with self.cond:
+            self.actors += 1
+
+    def detach(self):
+        with self.cond:
+            self.actors -= 1
+            self._advance()
+
+    def join(self, thread):
+        # sleep on the clock while we wait so time moves for the thread but any others
+        # (e.g. a sampler) can't run on ahead of us once it has ended
+        alive = getattr(thread, 'is_alive', None)
+        while alive is not None and alive():
+            self.sleep(self.JOINSTEP)
+        thread.join()
+
+    def addListener(self, listener):
+        ''' listener(old, new) is called each time the clock moves forward '''
+        self.listeners.append(listener)
+
+    def _advance(self):
+        ''' move time on if everyone is asleep. call with the lock held '''
+        if not self.deadlines or len(self.deadlines) < self.actors:
+            return
+        target = min(self.deadlines.values())
+        if target <= self.now:
+            return  # someone is already due and just hasn't run yet
+        for listener in self.listeners:
+            listener(self.now, target)
+        self.now = target
+        self.steps += 1
+        self.cond.notify_all()
+
+# the clock used when none is given
+CLOCK = RealClock()
@@ -1,10 +1,14 @@
 from graphicslib import OledGrafx, pighelp
 import pwmcontrol
-import time
+import pidcontrol
+import clocks
+import sampler
+import max31855
 import _thread
-import pigpio
+from graphicslib.pighelp import pigpio
 import threading
 import queue
+import collections
 
 HOTBIT = 18 # the pin with the switch
 FANBIT = 23 # the pin for the fan
@@ -14,6 +18,7 @@ FANBIT = 23 # the pin for the fan
 isRunning = True
 iamRunning = False
 runLoop = True
+heaterTrip = 0  # the thermocouple fault bits that tripped the heater off, see tripHeater
 
 PwmObject = pwmcontrol.PwmDevice()
 FanMotor = pwmcontrol.PwmControl(PwmObject, 0)
@@ -37,72 +42,389 @@ def readSpi(hspi):
     return data
 
 def dataToTemp(data):
-    ''' convert raw spi output into temperature data '''
-    # sign, 13 bits of data (*4), res, 1 bit fault=1,
-    # sign, 10 bits (*16) internal, res, 3 fault bits
-    # int is four bytes, so... '''
-    temp = int.from_bytes(data[0:2], 'big') >> 2 # 14 bits of data
-    temp = temp / 4.0   # a few decimal places
-    ref = int.from_bytes(data[2:4], 'big') >> 4  # 12 bits of data
-    ref = ref / 16.0
+    ''' convert raw spi output into temperature data (C), the temperature is nan on a fault
+        the temperature is corrected with the NIST type K table and the cold junction (max31855.linearize) '''
+    temp, ref, _ = max31855.decodeFrame(data, linear=True)
     return temp, ref
 
+class ThermocoupleFault(Exception):
+    ''' the thermocouple chip reported a fault, the heater has been tripped off '''
+    def __init__(self, faults):
+        Exception.__init__(self, "Thermocouple fault: " + max31855.faultText(faults))
+        self.faults = faults
+
+def tripHeater(faults):
+    ''' turn the heater off and keep it off (TempRunner, WaveRunner) until clearTrip '''
+    global heaterTrip
+    heaterTrip = faults
+    setVoltage(0)
+    api = getApi()
+    api.wave_tx_stop()
+    api.write(HOTBIT, 0)
+
+def clearTrip():
+    global heaterTrip
+    heaterTrip = 0
+
 def setFanRate(rate):
     FanMotor.setSpeed(rate)
 
-class TempRunner(threading.Thread):
-    ''' threaded pwm temperature switching '''
+class RateEstimator():
+    ''' the rate of change (per second) of a reading, a least squares line over the last window seconds
+        the thermocouple steps in .45F so a single difference is mostly noise
+        the sums of the fit are kept as samples come and go so a sample costs the same for any window
+    '''
+    def __init__(self, window=2.0):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.samples = collections.deque()  # (time, value) oldest first
+        self.base = None                    # times are taken from here so the sums stay small
+        self.sums = [0.0, 0.0, 0.0, 0.0]    # t, v, t*t, t*v
+
+    def _sum(self, t, v, sign):
+        sums = self.sums
+        t -= self.base
+        sums[0] += sign * t
+        sums[1] += sign * v
+        sums[2] += sign * t * t
+        sums[3] += sign * t * v
+
+    def add(self, now, value):
+        ''' a new sample, returns the rate '''
+        self.samples.append((now, value))
+        if self.base is None or now - self.base > 10 * self.window + 1:
+            # start the sums again from the oldest sample now and then so the rounding can't build up
+            self.base = self.samples[0][0]
+            self.sums = [0.0, 0.0, 0.0, 0.0]
+            for (t, v) in self.samples:
+                self._sum(t, v, 1)
+        else:
+            self._sum(now, value, 1)
+        while now - self.samples[0][0] > self.window:
+            (t, v) = self.samples.popleft()
+            self._sum(t, v, -1)
+        return self.rate()
+
+    def rate(self):
+        count = len(self.samples)
+        if count < 2:
+            return 0.0
+        (st, sv, stt, stv) = self.sums
+        spread = stt - st * st / count
+        if spread <= 1e-9 * max(1.0, stt):
+            return 0.0
+        return (stv - st * sv / count) / spread
+
+class CycleStats():
+    ''' timing of the heater switching cycles of a TempRunner '''
+    # upper edges of the lateness histogram bins in seconds, the last bin is everything later
+    BINS = [0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05]
+
     def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.cycles = 0
+        self.planned = 0.0      # total planned on time
+        self.actual = 0.0       # total measured on time
+        self.period = 0.0       # total cycle time of the switching cycles
+        self.overruns = 0       # deadlines that had already passed when we got to them
+        self.maxLate = 0.0
+        self.histogram = [0] * (len(self.BINS) + 1)
+        self.commands = 0       # setCycle calls that reached the relay
+        self.commandTime = 0.0  # total time from setCycle to the relay output
+        self.maxCommand = 0.0
+
+    def late(self, seconds):
+        ''' record how late a switch happened relative to its deadline '''
+        slot = 0
+        while slot < len(self.BINS) and seconds > self.BINS[slot]:
+            slot += 1
+        self.histogram[slot] += 1
+        self.maxLate = max(self.maxLate, seconds)
+
+    def cycle(self, planned, actual, period):
+        ''' record the planned and measured on time of one cycle '''
+        self.cycles += 1
+        self.planned += planned
+        self.actual += actual
+        self.period += period
+
+    def command(self, seconds):
+        ''' record the time from a setCycle call to the relay output '''
+        self.commands += 1
+        self.commandTime += seconds
+        self.maxCommand = max(self.maxCommand, seconds)
+
+    def report(self):
+        commands = "{0} commands, latency max {1:.2f} ms average {2:.2f} ms".format(
+            self.commands, 1000 * self.maxCommand, 1000 * self.commandTime / max(self.commands, 1))
+        if not self.period:
+            return "No switching cycles, " + commands
+        bins = ["<={0:g}ms:{1}".format(1000 * edge, count) for (edge, count) in zip(self.BINS, self.histogram)]
+        bins.append(">{0:g}ms:{1}".format(1000 * self.BINS[-1], self.histogram[-1]))
+        return ("{0} cycles, duty planned {1:.2f}% delivered {2:.2f}%, {3} overruns, max late {4:.2f} ms\n"
+                .format(self.cycles, 100 * self.planned / self.period, 100 * self.actual / self.period,
+                        self.overruns, 1000 * self.maxLate) + "late: " + " ".join(bins) + "\n" + commands)
+
+class TempRunner(threading.Thread):
+    ''' threaded pwm temperature switching
+        the switching runs on absolute deadlines so time spent writing to the relay or waiting
+        for the scheduler doesn't add up over cycles. The timing goes in self.stats (CycleStats)
+        setCycle wakes the thread so a new setting takes over the rest of the current cycle
+        with a quantum (seconds) the on time is spread out instead of one on/off window per
+        cycletime: each quantum is on or off as an error accumulator (sigma-delta) says, so the
+        average power is exact and the relay never switches faster than the quantum, a new
+        setting starts at the next quantum
+    '''
+    OVERRUN = 0.001     # a deadline that had passed by more than this when we got to it is an overrun
+
+    def __init__(self, clock=None, quantum=0):
         threading.Thread.__init__(self)
-        self.que = queue.Queue(20)
+        self.clock = clock if clock is not None else clocks.CLOCK
+        self.quantum = quantum
+        self.error = 0                  # the sigma-delta accumulator in percent
+        self.previous = None            # (planned on time, start) of the last quantum if it was switching
+        self.state = 0                  # the relay output
+        self.switchon = 0.0             # when the relay last went on
+        # the current switching cycle for the stats, added up over the settings it had
+        self.cycleStart = 0.0
+        self.segment = 0.0              # when the setting in force started
+        self.planned = 0.0              # on time the settings called for so far
+        self.ontime = 0.0               # on time measured so far
+        self.partial = False            # True if a duty in between 0 and 100 ran this cycle
+        self.lock = threading.Lock()
+        self.wake = self.clock.event()  # set by setCycle and stop
+        self.pending = None             # the newest (percent, cycletime, time of the call)
+        self.commanded = None           # time of the setCycle call not yet at the relay
         self.percent = 0
         self.cycletime = 1
         self.running = True
+        self.stats = CycleStats()
+
+    def start(self):
+        ''' attach to the clock before the thread starts sleeping on it '''
+        self.clock.attach()
+        threading.Thread.start(self)
+
+    def _until(self, deadline):
+        ''' sleep until the deadline, returns True if woken early by setCycle or stop '''
+        now = self.clock.monotonic()
+        if now < deadline:
+            if self.clock.wait(self.wake, deadline - now):
+                return True
+            now = self.clock.monotonic()
+        elif now - deadline > self.OVERRUN:
+            self.stats.overruns += 1
+        self.stats.late(max(0.0, now - deadline))
+        return False
+
+    def _take(self):
+        ''' pick up the newest setting from setCycle, returns True if the cycle time changed '''
+        with self.lock:
+            self.wake.clear()
+            cycletime = self.cycletime
+            if self.pending is not None:
+                (self.percent, self.cycletime, self.commanded) = self.pending
+                self.pending = None
+            return cycletime != self.cycletime
+
+    def _switch(self, value):
+        ''' set the relay and note the command latency if this is a new setting '''
+        value = 0 if heaterTrip else value
+        setVoltage(value)
+        if value and not self.state:
+            self.switchon = self.clock.monotonic()
+        elif self.state and not value:
+            self.ontime += self.clock.monotonic() - max(self.switchon, self.cycleStart)
+        self.state = value
+        if self.commanded is not None:
+            self.stats.command(self.clock.monotonic() - self.commanded)
+            self.commanded = None
 
     def run(self):
         ''' overriden, call start() to run this thread '''
         setVoltage(0)
         try:
-            ton = self.percent * self.cycletime / 100.0
-            toff = (100-self.percent) * self.cycletime / 100.0
+            begin = self.clock.monotonic()  # the start of the current cycle
+            self._startCycle(begin)
             while self.running:
-                if not self.que.empty():
-                    (self.percent, self.cycletime) = self.que.get()
-                    ton = self.percent * self.cycletime / 100.0
-                    toff = (100-self.percent) * self.cycletime / 100.0
-                    setVoltage(0)
-                if self.percent > 0:
-                    setVoltage(1)
-                    time.sleep(ton)
-                    if self.percent < 100:
-                        setVoltage(0)
-                        time.sleep(toff)
+                self._account(self.clock.monotonic())
+                if self._take() and self.quantum <= 0:
+                    # a new cycle time starts a new cycle now
+                    begin = self.clock.monotonic()
+                    self._endCycle(begin)
+                if not self.running:
+                    break
+                if self.quantum > 0:
+                    # a new setting waits for the next quantum, it never cuts one short
+                    if self._until(begin):
+                        continue
+                    period = self._spread()
+                elif self.percent >= 100 or self.percent <= 0:
+                    # no switching so just hold the relay
+                    self._switch(1 if self.percent >= 100 else 0)
+                    period = self.cycletime
+                    if self._until(begin + period):
+                        continue
                 else:
-                    # no percent so just keep sleeping
-                    time.sleep(.2)
+                    # a new setting part way through a cycle changes the rest of that cycle
+                    period = self.cycletime
+                    ton = self.percent * self.cycletime / 100.0
+                    if self.clock.monotonic() < begin + ton:
+                        self._switch(1)
+                        if self._until(begin + ton):
+                            continue
+                    self._switch(0)
+                    if self._until(begin + period):
+                        continue
+                begin += period
+                if self.quantum <= 0:
+                    self._endCycle(begin)
+                if self.clock.monotonic() > begin + period:
+                    begin = self.clock.monotonic()  # we lost a whole cycle, start over from now
+                    self._startCycle(begin)
         except Exception as ex:
             print("doPwmTemp error: " + str(ex))
         setVoltage(0)
+        self.clock.detach()
+
+    def _startCycle(self, start):
+        self.cycleStart = start
+        self.segment = start
+        self.planned = 0.0
+        self.ontime = 0.0
+        self.partial = False
+
+    def _account(self, now):
+        ''' add the on time the setting in force called for up to now to the cycle '''
+        if self.quantum > 0:
+            return
+        ton = max(0.0, min(self.percent, 100)) * self.cycletime / 100.0
+        start = max(self.segment, self.cycleStart)
+        stop = min(now, self.cycleStart + ton)
+        self.planned += max(0.0, stop - start)
+        self.segment = max(self.segment, now)
+        if 0 < self.percent < 100:
+            self.partial = True
+
+    def _endCycle(self, end):
+        ''' the cycle ended at end, record it once whatever settings it had and start the next '''
+        self._account(end)
+        if self.state:
+            self.ontime += max(0.0, end - max(self.switchon, self.cycleStart))
+        # only cycles with a duty in between count as switching cycles
+        if self.partial and end > self.cycleStart:
+            self.stats.cycle(self.planned, self.ontime, end - self.cycleStart)
+        self._startCycle(end)
+
+    def _spread(self):
+        ''' one quantum of the sigma-delta mode, returns the quantum '''
+        now = self.clock.monotonic()
+        if self.previous is not None:
+            (planned, start) = self.previous
+            self.stats.cycle(planned, now - start if self.state else 0.0, now - start)
+        self.error += self.percent
+        state = 1 if self.error >= 100 else 0
+        self.error -= 100 * state
+        self._switch(state)
+        # only quanta with a duty in between count as switching cycles
+        if 0 < self.percent < 100:
+            self.previous = (self.percent * self.quantum / 100.0, now)
+        else:
+            self.previous = None
+        return self.quantum
 
     def stop(self):
         ''' asynchronous stop '''
         self.running = False
+        self.wake.set()
+
+    def setCycle(self, percent, cycletime):
+        # this changes the cycle time and percent right away
+        with self.lock:
+            self.pending = (percent, cycletime, self.clock.monotonic())
+            self.wake.set()
+
+class WaveRunner():
+    ''' pwm temperature switching on HOTBIT done by pigpio.
+        each cycle is a DMA timed waveform repeated by the pigpio daemon so python only
+        sends a new waveform when the duty changes. This has the TempRunner interface.
+    '''
+    def __init__(self, clock=None):
+        self.clock = clock if clock is not None else clocks.CLOCK
+        self.percent = 0
+        self.cycletime = 1
+        self.wave = None     # the waveform being sent
+        self.stale = []      # older waveforms to delete once they stop
+        getApi().set_mode(HOTBIT, pigpio.OUTPUT)
+
+    def start(self):
+        self.setCycle(self.percent, self.cycletime)
+
+    def stop(self):
+        self.setCycle(0, self.cycletime)
+
+    def join(self, timeout=None):
+        pass
 
     def setCycle(self, percent, cycletime):
-        # this automatically changes the cycle time and percent
-        self.que.put((percent, cycletime))
+        ''' change the duty (0...100) and cycle time (seconds) '''
+        api = getApi()
+        self.percent = 0 if heaterTrip else max(0, min(100, percent))
+        self.cycletime = cycletime
+        if self.percent in (0, 100):
+            # no switching needed, just hold the pin
+            api.wave_tx_stop()
+            api.write(HOTBIT, 1 if self.percent else 0)
+            self._retire()
+            return
+        ton = int(self.percent * self.cycletime * 10000) # microseconds
+        toff = int(self.cycletime * 1000000) - ton
+        api.wave_add_generic([pigpio.pulse(1 << HOTBIT, 0, ton),
+                              pigpio.pulse(0, 1 << HOTBIT, toff)])
+        wave = api.wave_create()
+        # the sync mode starts the new waveform at the end of the current cycle
+        api.wave_send_using_mode(wave, pigpio.WAVE_MODE_REPEAT_SYNC)
+        self._retire()
+        self.wave = wave
+
+    def _retire(self):
+        ''' delete the waveforms that are no longer being sent '''
+        api = getApi()
+        if self.wave is not None:
+            self.stale.append(self.wave)
+            self.wave = None
+        current = api.wave_tx_at() if api.wave_tx_busy() else -1
+        for wave in list(self.stale):
+            if wave != current:
+                api.wave_delete(wave)
+                self.stale.remove(wave)
 
 class Reader():
-    def __init__(self):
+    ''' the temperature loops. with sampled=True a sampler.Sampler thread reads the thermocouple
+        and the loops take its newest reading instead of each reading the chip
+        a thermocouple fault trips the heater off and raises ThermocoupleFault, a new Reader clears the trip
+    '''
+    def __init__(self, clock=None, sampled=False):
+        self.clock = clock if clock is not None else clocks.CLOCK
         # turn off the voltage just in case
         getApi().set_mode(HOTBIT, pigpio.OUTPUT)
         setVoltage(0)
+        clearTrip()
         #
-        self.oled = OledGrafx.OledGrafx(False)
+        self.oled = OledGrafx.OledGrafx(False, threaded=True) # keep i2c out of the sampling loop
         self.oled.PrintStrings("Initial","Setup","","")
         self.hspi = getSpi()
         self.rque = queue.Queue(20)
-        self.starttime = time.time()
+        self.starttime = self.clock.time()
+        self.sampler = None
+        if sampled:
+            self.sampler = sampler.Sampler(self.hspi, self.clock)
+            self.sampler.onfault = tripHeater   # at once, not when a loop gets to the reading
+            self.sampler.start()
 
     def readvalue(self):
         #data=bytearray(4)
@@ -111,6 +433,27 @@ class Reader():
         #self.hspi.readinto(data)
         return data
 
+    def readtemp(self):
+        ''' the thermocouple temperature in F '''
+        sample = self.sampler.latest() if self.sampler is not None else None
+        if sample is not None:
+            (_, temp, _, faults) = sample
+        else:
+            temp, _, faults = max31855.decodeFrame(self.readvalue(), linear=True)
+            temp = 32 + temp * 9 /5
+        if faults:
+            tripHeater(faults)
+            raise ThermocoupleFault(faults)
+        return temp
+
+    def close(self):
+        ''' stop the sampler thread if there is one and the display thread '''
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.clock.join(self.sampler)
+            self.sampler = None
+        self.oled.Stop()
+
     def Stop(self):
         global isRunning
         isRunning = False
@@ -123,33 +466,44 @@ class Reader():
         temp,ref = dataToTemp(data)
 
     def printpos(self, posn, temper):
+        # the corrected readings aren't on the chip's .45F steps, one place fits the line
+        temper = "{0:.1f}".format(temper)
         if posn == 0:
-                self.oled.PrintStrings(first=str(temper))
+                self.oled.PrintStrings(first=temper)
         elif posn == 1:
-                self.oled.PrintStrings(second=str(temper))
+                self.oled.PrintStrings(second=temper)
         elif posn == 2:
-                self.oled.PrintStrings(third=str(temper))
+                self.oled.PrintStrings(third=temper)
         else:
-                self.oled.PrintStrings(fourth=str(temper))
+                self.oled.PrintStrings(fourth=temper)
 
-    def rloop(self, target=0, limit=0, keeptime=False):
+    def rloop(self, target=0, limit=0, keeptime=False, lead=0):
+        ''' sample until the temperature gets to target (F) or for limit seconds
+            with a lead (seconds) the loop ends when the temperature lead seconds from now, at the
+            current rate of rise, gets to the target. Cutting the heater then lets the heat still on
+            its way to the thermocouple carry the peak up to the target instead of past it
+            (see sysid.PlantModel.lead for a lead from an identified plant)
+        '''
         position = 0
         runLoop = True
-        begintime = time.time()
+        begintime = self.clock.time()
         if keeptime:
             started = self.starttime
         else:
             started = begintime
+        rate = RateEstimator()
         while runLoop:
-            time.sleep(.1)
-            data = self.readvalue()
-            temp,_ = dataToTemp(data)
-            temp = 32 + temp * 9 /5
+            self.clock.sleep(.1)
+            temp = self.readtemp()
+            now = self.clock.time()
+            rise = max(0.0, rate.add(now, temp)) * lead if lead else 0.0
             # stop when we hit temperature target
             if target > 0 and temp >= target:
                 print("At target temperature.")
                 runLoop = False
-            now = time.time()
+            elif target > 0 and temp + rise >= target:
+                print("At target temperature less {0:.1f} to come.".format(rise))
+                runLoop = False
             if limit > 0 and (now-begintime) > limit:
                 print("At target time.")
                 runLoop = False
@@ -158,63 +512,170 @@ class Reader():
                 self.printpos( (position/10) % 4, temp)
                 print("{0:.2f} ::: ".format(now-started) + str(temp))
 
-    def doset(self, temper):
+    def pidloop(self, runner, pid, setpoint, target=0, limit=0, keeptime=False, cycletime=1):
+        ''' like rloop but the heater duty comes from the pid controller every sample
+            runner is a TempRunner/WaveRunner, pid a pidcontrol.PidController
+        '''
         position = 0
-        ison = True
-        setValue(0)
-        while runLoop:
-            data = self.readvalue()
-            temp,_ = dataToTemp(data)
-            temp = 32 + temp * 9 /5
-            self.printpos( position, temp)
-            if ison and temp > (temper-2):
-                ison = False
-                setValue(0)
-            elif not ison and temp < (temper-5):
-                setValue(1)
-                ison = True
-            time.sleep(1)
+        running = True
+        begintime = self.clock.time()
+        started = self.starttime if keeptime else begintime
+        pid.setSetpoint(setpoint)
+        # pick up from the duty the heater is at now, a new setpoint mustn't kick the output
+        pid.track(runner.percent, self.readtemp(), begintime)
+        while running:
+            self.clock.sleep(.1)
+            temp = self.readtemp()
+            now = self.clock.time()
+            percent = self.pidstep(runner, pid, temp, now, cycletime)
+            if target > 0 and temp >= target:
+                print("At target temperature.")
+                running = False
+            if limit > 0 and (now-begintime) > limit:
+                print("At target time.")
+                running = False
+            position = position + 1
+            self.printduty(position, now-started, temp, percent)
+
+    def pidstep(self, runner, pid, temp, now, cycletime=1, feedforward=0.0):
+        ''' one pid sample, the new duty goes to the runner and is returned '''
+        percent = pid.update(temp, now, feedforward)
+        # only wake the runner when the duty really changes
+        if abs(percent - runner.percent) >= 0.5 or (percent in (0, 100) and percent != runner.percent):
+            runner.setCycle(percent, cycletime)
+        return percent
+
+    def printduty(self, position, elapsed, temp, percent, label=None):
+        ''' every tenth sample show the temperature and print "time ::: temp @ duty%" (see sysid.parseLines) '''
+        if not (position % 10):
+            self.printpos( (position/10) % 4, temp)
+            print("{0:.2f} ::: {1}{2} @ {3:.1f}%".format(elapsed, label + " " if label else "", temp, percent))
+
+    def coolloop(self, cooler, target=0, limit=0, keeptime=False):
+        ''' run the fan from a pidcontrol.CoolingController until the temperature gets down to target (F)
+            or for limit seconds
+        '''
+        position = 0
+        running = True
+        begintime = self.clock.time()
+        started = self.starttime if keeptime else begintime
+        rate = RateEstimator(4.0)
+        cooler.reset()
+        fan = None
+        while running:
+            self.clock.sleep(.1)
+            temp = self.readtemp()
+            now = self.clock.time()
+            cooling = -rate.add(now, temp)
+            speed = int(round(cooler.update(cooling, now)))
+            if speed != fan:
+                fan = speed
+                setFanRate(fan)
+            if target > 0 and temp <= target:
+                print("At target temperature.")
+                running = False
+            if limit > 0 and (now-begintime) > limit:
+                print("At target time.")
+                running = False
             position = position + 1
-            if position == 4:
-                position = 0
-            now = time.gmtime() # hours, minutes, seconds
-            print("At {}:{}.{} ::: ".format(now[3], now[4], now[5]) + str(temp))
-        setValue(0)
+            if not (position % 10):
+                self.printpos( (position/10) % 4, temp)
+                print("{0:.2f} ::: {1} cooling {2:.2f} F/s fan {3:.0f}%".format(now-started, temp, cooling, fan))
+
+    def doset(self, temper, runner, pid=None):
+        ''' hold the temperature at temper (F) until runLoop is cleared '''
+        pid = pid if pid is not None else pidcontrol.PidController()
+        while runLoop:
+            self.pidloop(runner, pid, temper, limit=60)
+        runner.setCycle(0, runner.cycletime)
 
     def dotest(self, percent, rate):
         global isRunning
         isRunning = False
-        time.sleep(.1)
+        self.clock.sleep(.1)
         isRunning = True
         position = 0
         ison = True
         print("start thread")
         tid = _thread.start_new_thread(doPwmTemp, (percent,rate))
         print("thread going")
-        starttime = time.time()
+        starttime = self.clock.time()
         while isRunning and runLoop:
-            data = self.readvalue()
-            temp,_ = dataToTemp(data)
-            temp = 32 + temp * 9 /5
+            temp = self.readtemp()
             self.printpos( position % 4, temp)
             position = position + 1
-            now = time.time() - starttime # elapsed seconds since start
+            now = self.clock.time() - starttime # elapsed seconds since start
             if 0 == (position % 10):
                 print("At {} ::: ".format(now) + str(temp))
 
 
-def runScript():
-    trun = TempRunner()
-    rdr = Reader()   # wait for 220F
+def runScript(clock=None, waves=False, quantum=0, lead=0, mpc=None, cooler=None, sampled=False):
+    ''' run the reflow profile. clock is a clocks.RealClock (default) or VirtualClock
+        waves=True switches the heater on HOTBIT with pigpio waveforms (WaveRunner)
+        quantum > 0 spreads the heater on time in quanta of that many seconds (see TempRunner)
+        lead > 0 cuts the heater early at the peak so the overshoot lands on 385F (see rloop)
+        mpc is an mpc.MpcController to run the peak instead of full power
+        cooler is a pidcontrol.CoolingController to run the fan instead of the timed steps
+        sampled=True reads the thermocouple in a sampler thread (see Reader)
+    '''
+    clock = clock if clock is not None else clocks.CLOCK
+    trun = WaveRunner(clock) if waves else TempRunner(clock, quantum)
+    rdr = Reader(clock, sampled)   # wait for 220F
     trun.setCycle(0, 1) # turn it off for now
     trun.start()
-    trun.setCycle(100, 1) # full on
-    rdr.rloop(target=220, keeptime=True)
-    trun.setCycle(25, 1) # slow
-    rdr.rloop(target=300, keeptime=True)
-    trun.setCycle(100, 1)
-    rdr.rloop(target=385, keeptime=True) # we need 20C > melting point
-    trun.setCycle(0, 1) # turn off stuff
+    try:
+        trun.setCycle(100, 1) # full on
+        rdr.rloop(target=220, keeptime=True)
+        trun.setCycle(25, 1) # slow
+        rdr.rloop(target=300, keeptime=True)
+        if mpc is not None:
+            rdr.pidloop(trun, mpc, 385, target=384, keeptime=True) # we need 20C > melting point
+        else:
+            trun.setCycle(100, 1)
+            rdr.rloop(target=385, keeptime=True, lead=lead) # we need 20C > melting point
+        trun.setCycle(0, 1) # turn off stuff
+        coolDown(rdr, cooler)
+    finally:
+        trun.stop()
+        clock.join(trun)
+        rdr.close()
+    print(rdr.oled.LatencyReport())
+    if hasattr(trun, 'stats'):
+        print(trun.stats.report())
+
+def runPidScript(clock=None, pid=None, waves=False, quantum=0, cooler=None, sampled=False):
+    ''' run the reflow profile with the pid controller setting the heater duty
+        pid is a pidcontrol.PidController (default gains if None), cooler and sampled as for runScript
+    '''
+    clock = clock if clock is not None else clocks.CLOCK
+    pid = pid if pid is not None else pidcontrol.PidController()
+    trun = WaveRunner(clock) if waves else TempRunner(clock, quantum)
+    rdr = Reader(clock, sampled)
+    trun.setCycle(0, 1)
+    trun.start()
+    pid.reset()
+    try:
+        rdr.pidloop(trun, pid, 300, target=295, keeptime=True) # preheat to the soak temperature
+        rdr.pidloop(trun, pid, 320, limit=90, keeptime=True) # soak
+        rdr.pidloop(trun, pid, 400, target=385, keeptime=True) # reflow, 20C > melting point
+        trun.setCycle(0, 1)
+        coolDown(rdr, cooler)
+    finally:
+        trun.stop()
+        clock.join(trun)
+        rdr.close()
+    print(rdr.oled.LatencyReport())
+    if hasattr(trun, 'stats'):
+        print(trun.stats.report())
+
+def coolDown(rdr, cooler=None):
+    ''' the fan steps at the end of a run
+        or with cooler (a pidcontrol.CoolingController) the fan holds its cooling rate down to 150F
+    '''
+    if cooler is not None:
+        rdr.coolloop(cooler, target=150, limit=600, keeptime=True)
+        setFanRate(0)
+        return
     # time to turn on the fan...
     setFanRate(50) # run half speed for a bit
     rdr.rloop(limit=10, keeptime=True) # 10 seconds
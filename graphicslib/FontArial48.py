@@ -87,7 +87,7 @@ Arial48Infos=[
     [0,0,0,0,0]]
 
 # Image Size: 219bytes x 41lines
-Arial48Pixels[]=[0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
+Arial48Pixels=[0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
 0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
 0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
 0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
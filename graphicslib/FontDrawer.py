@@ -10,6 +10,18 @@ class Datum() :
         self.Offset = value[3]      # the offset of the glyph start in the box
         self.Advance = value[4]     # amount to move after drawing
 
+# a glyph converted to the display page layout for one vertical shift
+# the oled buffer is vertical bytes (bit 0 = top row of the page) so a glyph
+# drawn at ypos covers (height + ypos%8) rows which are split into pages here
+class Glyph() :
+    def __init__(self, columns, height, shift) :
+        bits = ((1 << height) - 1) << shift
+        self.Pages = []     # a list of (data bytes, mask, isfull) per page
+        for page in range(0, (height + shift + 7) // 8) :
+            mask = (bits >> (8 * page)) & 0xFF
+            data = bytes([((col << shift) >> (8 * page)) & 0xFF for col in columns])
+            self.Pages.append((data, mask, mask == 0xFF))
+
 # the class that draws characters to an Oled display
 # on init it creates a lookup table to the font metadata by character
 class FontDrawer(object) :
@@ -19,38 +31,65 @@ class FontDrawer(object) :
         self.chartodata = { }
         numdata = len(font.info)
         for i in range(0, numdata) :
-            self.chartodata[font.info[i][0]] = i
+            self.chartodata[font.info[i][0]] = Datum(font.info[i])
+        # rasterized glyphs by (character, ypos % 8), filled on first use
+        self.glyphs = { }
         # get N space
-        self.emWidth = font.info[self.chartodata[78]][4]
+        self.emWidth = self.chartodata[78].Advance
         print("We have " + str(len(font.data)) + " data points and " + str(len(self.chartodata)) + " datums.")
 
+    # read the glyph out of the font image as one int per column (bit 0 = top row)
+    def _columns(self, c) :
+        columns = []
+        for x in range(0, c.Width) :
+            uoff = c.Xpos + x
+            bitmask = 0x80 >> (uoff & 7)
+            col = 0
+            for y in range(0, self.font.height) :
+                if self.font.data[(uoff >> 3) + y * self.font.width] & bitmask :
+                    col |= 1 << y
+            columns.append(col)
+        return columns
+
+    # get the page-aligned glyph for a character at a given vertical shift
+    def _glyph(self, theChar, shift) :
+        key = (theChar, shift)
+        glyph = self.glyphs.get(key)
+        if glyph is None :
+            glyph = Glyph(self._columns(self.chartodata[theChar]), self.font.height, shift)
+            self.glyphs[key] = glyph
+        return glyph
+
     # draw a single character to the display
-    # this is not optimized at all
+    # this copies whole page bytes into the display buffer
     def DrawChar(self, theChar, xpos, ypos) :
         if theChar == 32 : # space character
             return self.emWidth
-        if not theChar in self.chartodata.keys() :
+        c = self.chartodata.get(theChar)
+        if c is None :
             return 0
-        idx = self.chartodata[theChar]
-        advance = 0
-        if idx :
-            c = Datum(self.font.info[idx])      # give the entries names
-            width = c.Width
-            advance = c.Advance
-            for y in range(0, self.font.height) :
-                # of bits offset (width is in bytes)
-                offset = c.Xpos
-                starty = ypos + y
-                # there are better ways to do this
-                for x in range(0, width) :
-                    uoff = offset + x
-                    bittwid = uoff - 8 * int(uoff/8)
-                    bitoff = int(uoff/8) + y * self.font.width
-                    bitv = (self.font.data[bitoff] & (0x80 >> bittwid)) != 0
-                    startx = xpos + c.Offset + x
-                    pval = 1 if bitv else 0
-                    self.oled.set_pixel(startx, starty, pval)
-        return advance
+        oled = self.oled
+        buffer = oled.buffer
+        glyph = self._glyph(theChar, ypos & 7)
+        # clip the glyph columns to the display
+        startx = xpos + c.Offset
+        first = max(0, -startx)
+        last = min(c.Width, oled.columns - startx)
+        if last <= first :
+            return c.Advance
+        page = ypos >> 3
+        oled.mark_dirty(startx + first, startx + last - 1, page, page + len(glyph.Pages) - 1)
+        for (data, mask, isfull) in glyph.Pages :
+            if 0 <= page < oled.pages :
+                dx = oled.offset + page * oled.columns + startx
+                if isfull :
+                    buffer[dx + first:dx + last] = data[first:last]
+                else :
+                    keep = ~mask & 0xFF
+                    for x in range(first, last) :
+                        buffer[dx + x] = (buffer[dx + x] & keep) | data[x]
+            page += 1
+        return c.Advance
 
     # draw a string to the display using the metadata
     # for positioning
@@ -65,4 +104,4 @@ class FontDrawer(object) :
             if (xnow + self.font.height) > self.oled.columns :
                 xnow = 0
                 ynow = ynow + self.font.height
-            
+
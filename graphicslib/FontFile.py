@@ -0,0 +1,80 @@
+# Compact binary font files
+# the FontArialNN modules hold their glyphs as python lists which are slow to import
+# and store every byte as an int object. This packs the same metrics and pixel data
+# into a small binary file that is memory mapped when loaded.
+#
+# File layout (little endian)
+#   header  : magic 'RFNT', version, height, width (bytes per row), glyph count
+#   metrics : count * 5 int16 (char, xpos, width, offset, advance) as in the Datum
+#   pixels  : height * width bytes of the font image
+#
+# to convert a font module: python3 -m graphicslib.FontFile FontArial11 Arial11.fnt
+
+import mmap
+import os
+import struct
+import importlib
+
+MAGIC = b'RFNT'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHH')
+METRIC = struct.Struct('<5h')
+
+# the default location for font files is next to this module
+FONTDIR = os.path.dirname(os.path.abspath(__file__))
+
+# a read-only sequence over the metrics table, entries are unpacked when asked for
+class FontInfo(object) :
+    def __init__(self, view, count) :
+        self.view = view
+        self.count = count
+
+    def __len__(self) :
+        return self.count
+
+    def __getitem__(self, index) :
+        if index < 0 :
+            index += self.count
+        if index < 0 or index >= self.count :
+            raise IndexError('font info index out of range')
+        return METRIC.unpack_from(self.view, index * METRIC.size)
+
+# a font loaded from a binary font file
+# this has the same info/data/height/width members as the FontArialNN classes
+class FontFile(object) :
+    def __init__(self, name) :
+        path = name if os.path.isabs(name) else os.path.join(FONTDIR, name)
+        with open(path, 'rb') as fin :
+            self.map = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.map)
+        (magic, version, self.height, self.width, count) = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION :
+            raise ValueError('Not a font file: ' + path)
+        start = HEADER.size
+        end = start + count * METRIC.size
+        self.info = FontInfo(view[start:end], count)
+        self.data = view[end:end + self.height * self.width]
+        if len(self.data) != self.height * self.width :
+            raise ValueError('Truncated font file: ' + path)
+
+# pack a font object (FontArialNN instance) into the binary layout
+def FontToBytes(font) :
+    out = bytearray(HEADER.pack(MAGIC, VERSION, font.height, font.width, len(font.info)))
+    for item in font.info :
+        out += METRIC.pack(*item)
+    out += bytes(font.data)
+    return bytes(out)
+
+# convert a font module from graphicslib (e.g. 'FontArial11') into a binary font file
+def ConvertModule(modname, path) :
+    module = importlib.import_module('graphicslib.' + modname)
+    font = getattr(module, modname)()
+    with open(path, 'wb') as fout :
+        fout.write(FontToBytes(font))
+
+if __name__ == '__main__' :
+    import sys
+    if len(sys.argv) != 3 :
+        print('usage: python3 -m graphicslib.FontFile <FontModule> <output.fnt>')
+    else :
+        ConvertModule(sys.argv[1], sys.argv[2])
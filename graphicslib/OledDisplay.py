@@ -82,9 +82,12 @@ DEVID = 0x3c
 # or <DEVID> <CTL_DAT> <display buffer bytes> <> <> <> <>...
 # These two values encode the Co (Continuation) bit as b7 and the
 # D/C# (Data/Command Selection) bit as b6.
-# mz-it really looks like 0 is right here and not 0x80. i think irrelevant since always one command per packet
-CTL_CMD = 0  # 0x80
+# Several commands go in one packet by setting Co on every control byte but the last
+# <DEVID> <CTL_CO|CTL_CMD> <command> <CTL_CO|CTL_CMD> <command> ... <CTL_CMD> <command>
+# and a data stream may follow the commands with <CTL_DAT> <display buffer bytes>...
+CTL_CMD = 0
 CTL_DAT = 0x40
+CTL_CO  = 0x80
 
 class OledDisplay(object) :
 
@@ -98,12 +101,16 @@ class OledDisplay(object) :
     self.devid = i2c_devid
     # used to reserve an extra byte in the image buffer
     self.offset = 1
-    # I2C command buffer
-    self.cbuffer = bytearray(2)
-    self.cbuffer[0] = CTL_CMD
+    # I2C transaction count, total and for the last display()
+    self.transactions = 0
+    self.frame_transactions = 0
     # data buffer
     self.buffer = bytearray(self.offset + self.pages * self.columns)
     self.buffer[0] = CTL_DAT
+    # changed column range (first, last) per page since the last display, or None
+    self.dirty = [None] * self.pages
+    # copy of what is on the screen, None until the first full display
+    self.shown = None
 
   # initialize the display hardware registers
   def init_display(self):
@@ -129,55 +136,131 @@ class OledDisplay(object) :
             DISPLAYALLON_RESUME,
             NORMALDISPLAY,
             DISPLAYON]
-    for item in data:
-      self.write_command(item)
+    self.write_commands(data)
     self.clear()
     self.display()
 
   def write_command(self, command_byte):
-    self.cbuffer[1] = command_byte
-    self.i2c.SendBuffer(self.cbuffer)
+    self.write_commands([command_byte])
+
+  # send a list of command bytes in one I2C write, optionally followed by display data
+  def write_commands(self, commands, data=None):
+    if not commands and data is None :
+      return  # nothing to send
+    packet = bytearray()
+    for item in commands :
+      packet.append(CTL_CO | CTL_CMD)
+      packet.append(item)
+    if data is None :
+      packet[-2] = CTL_CMD # no continuation after the last command
+    else :
+      packet.append(CTL_DAT)
+      packet += data
+    self._send(packet)
+
+  # all I2C writes come through here so they get counted
+  def _send(self, packet):
+    self.transactions += 1
+    self.i2c.SendBuffer(packet)
 
   def invert_display(self, invert):
     self.write_command(INVERTDISPLAY if invert else NORMALDISPLAY)
 
   # clear the display buffer
   def clear(self):
-    for i in range(self.offset, len(self.buffer)) :
-      self.buffer[i] = 0
+    for y in range(0, self.pages) :
+      dx = self.offset + y * self.columns
+      if any(self.buffer[dx:dx + self.columns]) :
+        self.mark_dirty(0, self.columns - 1, y, y)
+    self.buffer[self.offset:] = bytes(len(self.buffer) - self.offset)
+
+  # record that columns x0...x1 of pages page0...page1 (inclusive) were drawn on
+  def mark_dirty(self, x0, x1, page0, page1):
+    x0 = max(x0, 0)
+    x1 = min(x1, self.columns - 1)
+    if x1 < x0 :
+      return
+    for y in range(max(page0, 0), min(page1, self.pages - 1) + 1) :
+      area = self.dirty[y]
+      if area is None :
+        self.dirty[y] = (x0, x1)
+      else :
+        self.dirty[y] = (min(area[0], x0), max(area[1], x1))
+
+  # get the dirty column range per page, trimmed to the bytes that differ from the screen
+  def _changed(self):
+    changed = [None] * self.pages
+    for y in range(0, self.pages) :
+      area = self.dirty[y]
+      if area is None :
+        continue
+      dx = self.offset + y * self.columns
+      (x0, x1) = area
+      # the bits that differ as one big number, its highest and lowest set bytes are the ends
+      diff = (int.from_bytes(self.buffer[dx + x0:dx + x1 + 1], 'big') ^
+              int.from_bytes(self.shown[dx + x0:dx + x1 + 1], 'big'))
+      if diff :
+        changed[y] = (x1 - (diff.bit_length() - 1) // 8, x1 - ((diff & -diff).bit_length() - 1) // 8)
+    return changed
+
+  # remember the buffer as shown and reset the dirty areas
+  def _shown(self):
+    self.shown = bytearray(self.buffer)
+    self.dirty = [None] * self.pages
 
   # show the display buffer on-screen
-  def display(self) :
+  # only the changed part is sent unless full is set (or nothing has been shown yet)
+  def display(self, full=False) :
+    start = self.transactions
+    if full or self.shown is None :
+      changed = [(0, self.columns - 1)] * self.pages
+    else :
+      changed = self._changed()
     if self.isSSD1306 :
-      self._display_ssd1306()
+      self._display_ssd1306(changed)
     else :
-      self._display_sh1106()
+      self._display_sh1106(changed)
+    self._shown()
+    self.frame_transactions = self.transactions - start
 
   # the SSD1306 can take the data in a gulp
-  def _display_ssd1306(self):
-    self.write_command(COLUMNADDR)
-    self.write_command(0)
-    self.write_command(self.columns - 1)
-    self.write_command(PAGEADDR)
-    self.write_command(0)
-    self.write_command(self.pages - 1)
-    self.i2c.SendBuffer(self.buffer)
+  # so send a single window covering all of the changed areas
+  def _display_ssd1306(self, changed):
+    pages = [y for y in range(0, self.pages) if changed[y] is not None]
+    if not pages :
+      return
+    x0 = min(changed[y][0] for y in pages)
+    x1 = max(changed[y][1] for y in pages)
+    commands = [COLUMNADDR, x0, x1, PAGEADDR, pages[0], pages[-1]]
+    if x0 == 0 and x1 == self.columns - 1 and len(pages) == self.pages :
+      self.write_commands(commands, memoryview(self.buffer)[self.offset:])
+      return
+    data = bytearray()
+    for y in range(pages[0], pages[-1] + 1) :
+      dx = self.offset + y * self.columns
+      data += self.buffer[dx + x0:dx + x1 + 1]
+    self.write_commands(commands, data)
 
   # the SH1106 needs the data sent in per page
-  def _display_sh1106(self):
-    m_col = 2
+  # so unchanged pages are skipped and changed ones send only their column range
+  def _display_sh1106(self, changed):
     for y in range(0, self.pages) :
-      self.write_command(SETPAGEADDR + y) # set page address
-      self.write_command(SETCOLADDR_LOW | (m_col & 0xf)) # reset lower column address
-      self.write_command(SETCOLADDR_HIGH | (m_col >> 4)) # reset higher column 
+      if changed[y] is None :
+        continue
+      (x0, x1) = changed[y]
+      m_col = 2 + x0 # the SH1106 has 132 columns and the display starts at 2
+      commands = [SETPAGEADDR + y, # set page address
+                  SETCOLADDR_LOW | (m_col & 0xf), # reset lower column address
+                  SETCOLADDR_HIGH | (m_col >> 4)] # reset higher column
       # offset in the buffer
       dx = self.offset + y * self.columns
-      # start with a data flag
-      self.i2c.SendBuffer( bytearray([CTL_DAT]) + self.buffer[dx:dx + self.columns])
+      # the page data follows the address commands in the same write
+      self.write_commands(commands, self.buffer[dx + x0:dx + x1 + 1])
 
   # set/clear/invert a pixel at an (x,y) location. (0,0) = upper left
   def set_pixel(self, x, y, state):
     index = x + (int(y / 8) * self.columns)
+    self.mark_dirty(x, x, y >> 3, y >> 3)
     if state == PIXEL_OFF:
       self.buffer[self.offset+index] &= ~(1 << (y & 7))
     elif state == PIXEL_INVERT:
@@ -192,5 +275,4 @@ class OledDisplay(object) :
     self.write_command(DISPLAYOFF)
 
   def contrast(self, contrast):
-    self.write_command(SETCONTRAST)
-    self.write_command(contrast)
+    self.write_commands([SETCONTRAST, contrast])
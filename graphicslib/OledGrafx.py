@@ -1,23 +1,95 @@
 # These are high level display routines so don't have to call the same
 # methods repeatedly in other applications
 
+import threading
+import time
 from graphicslib import OledDisplay
-from graphicslib import FontArial11
+from graphicslib import FontFile
 from graphicslib import FontDrawer
 
 # a simple hook to disable this module if there's no display connected
 _HasGraphics = True
 
+# a thread that renders and sends display updates so the caller doesn't wait on i2c
+# only the newest pending state is kept, older unsent updates are merged into it
+class DisplayWorker(threading.Thread) :
+    def __init__(self, grafx) :
+        threading.Thread.__init__(self, daemon=True)
+        self.grafx = grafx
+        self.cond = threading.Condition()
+        self.frame = None       # pending full frame (bytes) or None
+        self.lines = { }        # pending text by line number 0...3
+        self.pending = False
+        self.busy = False
+        self.running = True
+        self.rendered = 0       # number of updates sent to the display
+        self.merged = 0         # number of updates merged into a newer one
+
+    # queue a frame and/or text lines, replacing what hasn't been sent yet
+    def post(self, frame=None, lines=None) :
+        with self.cond :
+            if self.pending :
+                self.merged += 1
+            if frame is not None :
+                self.frame = frame
+                self.lines = { }
+            if lines :
+                if 0 in lines : # the first line clears the display so drop the older text
+                    self.frame = None
+                    self.lines = { }
+                self.lines.update(lines)
+            self.pending = True
+            self.cond.notify()
+
+    def run(self) :
+        while True :
+            with self.cond :
+                while self.running and not self.pending :
+                    self.cond.wait()
+                if not self.running :
+                    break
+                frame, lines = self.frame, self.lines
+                self.frame, self.lines = None, { }
+                self.pending = False
+                self.busy = True
+            try :
+                self.grafx._render(frame, lines)
+            except Exception as ex :
+                print("Display error: " + str(ex))
+            with self.cond :
+                self.busy = False
+                self.rendered += 1
+                self.cond.notify_all()
+
+    # wait until everything posted has been sent, returns False on timeout
+    def flush(self, timeout=None) :
+        with self.cond :
+            return self.cond.wait_for(lambda : not (self.pending or self.busy), timeout)
+
+    def stop(self) :
+        with self.cond :
+            self.running = False
+            self.cond.notify_all()
+
 # the high level graphics class
+# with threaded=True the drawing and i2c happen on a DisplayWorker thread
 class OledGrafx :
-    def __init__(self, isFor1306) :
+    def __init__(self, isFor1306, threaded=False) :
+        self.worker = None
+        # time the callers spend inside PrintStrings/ShowFrame
+        self.maxLatency = 0.0
+        self.totalLatency = 0.0
+        self.calls = 0
         if OledGrafx.HasGrafx :
             self.oled = OledDisplay.OledDisplay(isFor1306)
             self.oled.init_display()
             self.oled.clear()
             self.oled.display()
-            self.font11 = FontArial11.FontArial11()
+            self.font11 = FontFile.FontFile('Arial11.fnt')
             self.drawer = FontDrawer.FontDrawer(self.font11, self.oled)
+            if threaded :
+                self.worker = DisplayWorker(self)
+                self.worker.start()
 
     @property
     def HasGrafx() :
@@ -27,15 +99,67 @@ class OledGrafx :
     def PrintStrings(self, first=None, second=None, third=None, fourth=None) :
         if not OledGrafx.HasGrafx :
             return
-        if(first is not None) :
-            self.oled.clear()
-            self.drawer.DrawString(first, 0, 0)
-        if(second is not None) :
-            self.drawer.DrawString(second, 0, self.font11.height)
-        if(third is not None) :
-            self.drawer.DrawString(third, 0, self.font11.height*2)
-        if(fourth is not None) :
-            self.drawer.DrawString(fourth, 0, self.font11.height*3)
-        self.oled.display()
+        started = time.perf_counter()
+        lines = { }
+        for (line, text) in enumerate((first, second, third, fourth)) :
+            if text is not None :
+                lines[line] = text
+        if self.worker is None :
+            self._render(None, lines)
+        else :
+            self.worker.post(lines=lines)
+        self._latency(started)
 
+    # show a full frame of (pages * columns) bytes in the display buffer layout
+    def ShowFrame(self, frame) :
+        if not OledGrafx.HasGrafx :
+            return
+        if len(frame) != self.oled.pages * self.oled.columns :
+            raise ValueError('Frame must be {0} bytes'.format(self.oled.pages * self.oled.columns))
+        started = time.perf_counter()
+        if self.worker is None :
+            self._render(bytes(frame), None)
+        else :
+            self.worker.post(frame=bytes(frame))
+        self._latency(started)
+
+    # wait for the display thread to finish sending, returns False on timeout
+    def Flush(self, timeout=None) :
+        if self.worker is None :
+            return True
+        return self.worker.flush(timeout)
+
+    def Stop(self) :
+        if self.worker is not None :
+            self.worker.stop()
+            self.worker.join()
+            self.worker = None
 
+    # a summary of how long callers were held up by the display
+    def LatencyReport(self) :
+        average = self.totalLatency / self.calls if self.calls else 0.0
+        report = "Display latency: max {0:.2f} ms, average {1:.2f} ms over {2} updates".format(
+            1000 * self.maxLatency, 1000 * average, self.calls)
+        if self.worker is not None :
+            report += ", {0} sent, {1} merged".format(self.worker.rendered, self.worker.merged)
+        return report
+
+    def _latency(self, started) :
+        elapsed = time.perf_counter() - started
+        self.calls += 1
+        self.totalLatency += elapsed
+        if elapsed > self.maxLatency :
+            self.maxLatency = elapsed
+
+    # draw a frame and/or text lines and send them to the display
+    def _render(self, frame, lines) :
+        if frame is not None :
+            offset = self.oled.offset
+            self.oled.buffer[offset:offset + len(frame)] = frame
+            self.oled.mark_dirty(0, self.oled.columns - 1, 0, self.oled.pages - 1)
+        if lines :
+            if 0 in lines :
+                self.oled.clear()
+            for line in sorted(lines) :
+                self.drawer.DrawString(lines[line], 0, self.font11.height * line)
+        self.oled.display()
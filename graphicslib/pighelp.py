@@ -1,4 +1,10 @@
-import pigpio
+import os
+
+# PIGPIO_SIM=1 runs everything against simulated devices (see pigsim)
+if os.environ.get('PIGPIO_SIM') :
+    from graphicslib import pigsim as pigpio
+else :
+    import pigpio
 
 class PigHelp():
     def __init__(self):
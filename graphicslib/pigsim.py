@@ -0,0 +1,402 @@
+# A simulated stand-in for the pigpio module
+# this has the pigpio calls that the hot plate code uses and models the devices
+# on the bus so the whole stack runs (and can be benchmarked) without a raspberry pi
+#   spi 0        : MAX31855 thermocouple converter (other spi channels get their own, see thermocouples)
+#   i2c 0x3c     : SSD1306 / SH1106 oled display
+#   i2c 0x60     : PCA9685 pwm controller
+# set PIGPIO_SIM=1 in the environment to have pighelp use this instead of pigpio
+
+INPUT = 0
+OUTPUT = 1
+
+WAVE_MODE_ONE_SHOT = 0
+WAVE_MODE_REPEAT = 1
+WAVE_MODE_ONE_SHOT_SYNC = 2
+WAVE_MODE_REPEAT_SYNC = 3
+WAVE_NOT_FOUND = 9998
+NO_TX_WAVE = 9999
+
+# a waveform step: set the gpios in gpio_on, clear those in gpio_off, then wait delay microseconds
+class pulse(object) :
+    def __init__(self, gpio_on, gpio_off, delay) :
+        self.gpio_on = gpio_on
+        self.gpio_off = gpio_off
+        self.delay = delay
+
+# the MAX31855 returns a 32 bit frame on each read
+# bits 31-18 thermocouple temperature (signed, 0.25C), 16 fault
+# bits 15-4 internal (cold junction) temperature (signed, 0.0625C), 2 SCV, 1 SCG, 0 OC
+class SimMax31855(object) :
+    FAULT_OC = 0x01     # open circuit
+    FAULT_SCG = 0x02    # short to ground
+    FAULT_SCV = 0x04    # short to vcc
+
+    def __init__(self, temp=25.0, ref=25.0) :
+        self.temp = temp        # hot junction temperature in C
+        self.ref = ref          # cold junction temperature in C
+        self.faults = 0         # any of the FAULT_ bits
+        self.source = None      # optional function returning the hot junction temperature
+        self.reads = 0
+
+    def frame(self) :
+        temp = self.source() if self.source is not None else self.temp
+        hot = int(round(temp * 4)) & 0x3FFF
+        cold = int(round(self.ref * 16)) & 0xFFF
+        value = (hot << 18) | (cold << 4) | (self.faults & 0x07)
+        if self.faults :
+            value |= 0x10000
+        return value.to_bytes(4, 'big')
+
+    def read(self, count) :
+        self.reads += 1
+        return bytearray(self.frame()[0:count])
+
+# the PCA9685 register file
+class SimPca9685(object) :
+    MODE1 = 0x00
+    LED0_ON_L = 0x06
+    ALL_LED_ON_L = 0xFA
+    AI = 0x20           # MODE1 register auto-increment
+    FULL = 0x10         # the full on/off bit in the _H registers
+
+    def __init__(self) :
+        self.registers = bytearray(256)
+        self.registers[self.MODE1] = 0x11    # power on default is sleep + allcall
+        # and every output full off
+        for register in range(self.LED0_ON_L + 3, self.ALL_LED_ON_L + 4, 4) :
+            self.registers[register] = self.FULL
+        self.writes = 0
+        self.reads = 0
+
+    def _write(self, register, value) :
+        register &= 0xFF
+        if self.ALL_LED_ON_L <= register <= self.ALL_LED_ON_L + 3 :
+            # the all-led registers write through to every channel
+            for channel in range(0, 16) :
+                self.registers[self.LED0_ON_L + 4 * channel + register - self.ALL_LED_ON_L] = value & 0xFF
+        self.registers[register] = value & 0xFF
+
+    # a write of one or more bytes starting at a register
+    # without auto-increment they all go to the same register as on the chip
+    def write(self, register, data) :
+        self.writes += 1
+        for value in data :
+            self._write(register, value)
+            if self.registers[self.MODE1] & self.AI :
+                register = (register + 1) & 0xFF
+
+    def read(self, register) :
+        self.reads += 1
+        return self.registers[register & 0xFF]
+
+    # the (on, off) counts of a channel including the full on/off bits
+    def channel(self, channel) :
+        base = self.LED0_ON_L + 4 * channel
+        on = self.registers[base] | (self.registers[base + 1] << 8)
+        off = self.registers[base + 2] | (self.registers[base + 3] << 8)
+        return (on, off)
+
+    # the fraction of the time a channel output is high
+    def duty(self, channel) :
+        (on, off) = self.channel(channel)
+        if off & 0x1000 :
+            return 0.0
+        if on & 0x1000 :
+            return 1.0
+        return ((off - on) % 4096) / 4096.0
+
+# an oled display controller, this follows the i2c control byte framing and
+# keeps the display ram so the screen contents can be checked
+class SimOled(object) :
+    # number of argument bytes for the commands that take them
+    ARGS = { 0x20: 1, 0x21: 2, 0x22: 2, 0x81: 1, 0x8D: 1, 0xA8: 1, 0xD3: 1,
+             0xD5: 1, 0xD9: 1, 0xDA: 1, 0xDB: 1 }
+
+    def __init__(self, is1306=True, pages=8) :
+        self.is1306 = is1306
+        self.pages = pages
+        self.ramcolumns = 128 if is1306 else 132
+        self.ram = bytearray(self.pages * self.ramcolumns)
+        self.column = 0
+        self.page = 0
+        self.window = (0, self.ramcolumns - 1, 0, self.pages - 1)
+        self.memorymode = 2     # page addressing after reset
+        self.command = None     # a command waiting for its arguments
+        self.args = []
+        self.on = False
+        self.writes = 0
+        self.bytes = 0
+
+    # handle one i2c write
+    def write(self, packet) :
+        self.writes += 1
+        self.bytes += len(packet)
+        index = 0
+        while index < len(packet) :
+            control = packet[index]
+            index += 1
+            isdata = (control & 0x40) != 0
+            if control & 0x80 :
+                chunk = packet[index:index + 1]     # continuation, one byte then another control byte
+            else :
+                chunk = packet[index:]              # the rest of the packet
+            index += len(chunk)
+            if isdata :
+                self._datablock(chunk)
+            else :
+                for value in chunk :
+                    self._command(value)
+
+    def _command(self, value) :
+        if self.command is not None :
+            self.args.append(value)
+            if len(self.args) == self.ARGS[self.command] :
+                self._execute(self.command, self.args)
+                self.command = None
+            return
+        if not self.is1306 and value in (0x20, 0x21, 0x22) :
+            return  # the SH1106 has no addressing mode or window commands, their arguments run as commands
+        if value in self.ARGS :
+            self.command = value
+            self.args = []
+        else :
+            self._execute(value, [])
+
+    def _execute(self, command, args) :
+        if command == 0x20 :
+            self.memorymode = args[0] & 3
+        elif command == 0x21 :
+            self.window = (args[0], args[1], self.window[2], self.window[3])
+            self.column = args[0]
+        elif command == 0x22 :
+            self.window = (self.window[0], self.window[1], args[0], args[1])
+            self.page = args[0]
+        elif 0xB0 <= command <= 0xB7 :
+            self.page = command & 0x07
+        elif command <= 0x0F :
+            self.column = (self.column & 0xF0) | command
+        elif command <= 0x1F :
+            self.column = (self.column & 0x0F) | ((command & 0x0F) << 4)
+        elif command == 0xAE :
+            self.on = False
+        elif command == 0xAF :
+            self.on = True
+
+    def _data(self, value) :
+        if self.page < self.pages and self.column < self.ramcolumns :
+            self.ram[self.page * self.ramcolumns + self.column] = value
+        if self.is1306 and self.memorymode == 0 :
+            # horizontal addressing wraps within the column/page window
+            (col0, col1, page0, page1) = self.window
+            self.column += 1
+            if self.column > col1 :
+                self.column = col0
+                self.page = page0 if self.page >= page1 else self.page + 1
+        elif self.column < self.ramcolumns - 1 :
+            self.column += 1
+
+    # as _data for each byte, in one slice for page addressing
+    def _datablock(self, chunk) :
+        if (self.is1306 and self.memorymode == 0) or self.column >= self.ramcolumns - 1 :
+            for value in chunk :
+                self._data(value)
+            return
+        # the column goes up to the last one and stays there
+        count = min(len(chunk), self.ramcolumns - self.column)
+        if self.page < self.pages :
+            start = self.page * self.ramcolumns + self.column
+            self.ram[start:start + count] = bytes(chunk[0:count])
+            if count < len(chunk) :
+                self.ram[start + count - 1] = chunk[-1]
+        self.column = min(self.column + len(chunk), self.ramcolumns - 1)
+
+    # the visible 128 columns in the OledDisplay buffer layout
+    def screen(self) :
+        start = 0 if self.is1306 else 2
+        out = bytearray()
+        for page in range(0, self.pages) :
+            dx = page * self.ramcolumns + start
+            out += self.ram[dx:dx + 128]
+        return bytes(out)
+
+# a thermal model of the hot plate: a heater element feeding a plate that loses heat
+# to the air, more so with the fan running. Temperatures are in C.
+# the numbers roughly match the readme, 1000W with 35% duty holding about 218C (425F)
+class SimPlate(object) :
+    def __init__(self, heater, fan, ambient=25.0) :
+        self.heater = heater    # function returning the heater duty 0...1
+        self.fan = fan          # function returning the fan duty 0...1
+        self.ambient = ambient
+        self.power = 1000.0     # W at full on
+        self.celement = 150.0   # J/C of the heater element
+        self.cplate = 850.0     # J/C of the plate
+        self.gelement = 30.0    # W/C from the element to the plate
+        self.gair = 1.8         # W/C from the plate to still air
+        self.gfan = 2.6         # W/C extra at full fan
+        self.fanmin = 0.35      # the fan doesn't turn below this
+        self.element = ambient
+        self.temp = ambient
+        self.trace = []         # (time, plate temperature, heater, fan) at each step
+
+    # move the model from time old to time new with the current heater and fan settings
+    def step(self, old, new) :
+        heat = self.heater()
+        fan = self.fan()
+        fan = fan if fan >= self.fanmin else 0.0
+        gair = self.gair + self.gfan * fan
+        now = old
+        while now < new :
+            dt = min(0.05, new - now)
+            flow = self.gelement * (self.element - self.temp)
+            self.element += dt * (self.power * heat - flow) / self.celement
+            self.temp += dt * (flow - gair * (self.temp - self.ambient)) / self.cplate
+            now += dt
+        self.trace.append((new, self.temp, heat, fan))
+
+# a replacement for pigpio.pi with simulated devices attached
+class pi(object) :
+    def __init__(self, host=None, port=None, is1306=False) :
+        self.connected = True
+        self.thermocouple = SimMax31855()
+        self.thermocouples = { 0: self.thermocouple }  # by spi channel, for more heater zones
+        self.pwm = SimPca9685()
+        self.oled = SimOled(is1306)
+        self.i2cdevices = { 0x3c: self.oled, 0x60: self.pwm }
+        self.handles = { }
+        self.modes = { }
+        self.levels = { }
+        self.pulses = [ ]       # pulses added for the next wave_create
+        self.waves = { }        # created waveforms by id
+        self.nextwave = 0
+        self.txwave = None      # the waveform being sent (always repeating here)
+        self.hardwarepwm = { }  # (frequency, duty of 1000000) by gpio
+
+    def stop(self) :
+        self.connected = False
+
+    def _device(self, handle) :
+        return self.handles[handle]
+
+    # gpio
+    def set_mode(self, gpio, mode) :
+        self.modes[gpio] = mode
+        return 0
+
+    def get_mode(self, gpio) :
+        return self.modes.get(gpio, INPUT)
+
+    def write(self, gpio, level) :
+        self.levels[gpio] = 1 if level else 0
+        return 0
+
+    def read(self, gpio) :
+        return self.levels.get(gpio, 0)
+
+    # the fraction of the time a gpio is high counting waveforms and hardware pwm
+    def duty(self, gpio) :
+        if self.txwave is not None :
+            level = self.levels.get(gpio, 0)
+            high = total = 0
+            for item in self.waves[self.txwave] :
+                if item.gpio_on & (1 << gpio) :
+                    level = 1
+                if item.gpio_off & (1 << gpio) :
+                    level = 0
+                total += item.delay
+                high += item.delay if level else 0
+            if total :
+                return high / float(total)
+        if gpio in self.hardwarepwm :
+            return self.hardwarepwm[gpio][1] / 1000000.0
+        return float(self.levels.get(gpio, 0))
+
+    def hardware_PWM(self, gpio, frequency, dutycycle) :
+        if frequency :
+            self.hardwarepwm[gpio] = (frequency, dutycycle)
+        else :
+            self.hardwarepwm.pop(gpio, None)
+        return 0
+
+    # waveforms, a new waveform replaces the one being sent at once (even for the _SYNC modes)
+    def wave_clear(self) :
+        self.pulses = [ ]
+        self.waves = { }
+        self.txwave = None
+        return 0
+
+    def wave_add_generic(self, pulses) :
+        self.pulses += pulses
+        return len(self.pulses)
+
+    def wave_create(self) :
+        wave = self.nextwave
+        self.nextwave += 1
+        self.waves[wave] = self.pulses
+        self.pulses = [ ]
+        return wave
+
+    def wave_delete(self, wave) :
+        del self.waves[wave]
+        if self.txwave == wave :
+            self.txwave = None
+        return 0
+
+    def wave_send_using_mode(self, wave, mode) :
+        self.txwave = wave
+        return len(self.waves[wave])
+
+    def wave_send_repeat(self, wave) :
+        return self.wave_send_using_mode(wave, WAVE_MODE_REPEAT)
+
+    def wave_tx_stop(self) :
+        self.txwave = None
+        return 0
+
+    def wave_tx_busy(self) :
+        return 1 if self.txwave is not None else 0
+
+    def wave_tx_at(self) :
+        return self.txwave if self.txwave is not None else NO_TX_WAVE
+
+    # spi
+    def spi_open(self, channel, baud, flags=0) :
+        if channel not in self.thermocouples :
+            self.thermocouples[channel] = SimMax31855()
+        handle = len(self.handles)
+        self.handles[handle] = self.thermocouples[channel]
+        return handle
+
+    def spi_close(self, handle) :
+        return 0
+
+    def spi_read(self, handle, count) :
+        data = self._device(handle).read(count)
+        return (len(data), data)
+
+    # i2c
+    def i2c_open(self, bus, address, flags=0) :
+        handle = len(self.handles)
+        self.handles[handle] = self.i2cdevices[address]
+        return handle
+
+    def i2c_close(self, handle) :
+        return 0
+
+    def i2c_write_device(self, handle, data) :
+        device = self._device(handle)
+        if isinstance(device, SimPca9685) :
+            device.write(data[0], data[1:])
+        else :
+            device.write(bytes(data))
+        return 0
+
+    def i2c_write_byte_data(self, handle, register, value) :
+        self._device(handle).write(register, [value])
+        return 0
+
+    def i2c_write_i2c_block_data(self, handle, register, data) :
+        self._device(handle).write(register, data)
+        return 0
+
+    def i2c_read_byte_data(self, handle, register) :
+        return self._device(handle).read(register)
@@ -0,0 +1,138 @@
+# Decoding of the MAX31855 thermocouple converter frames
+# a frame is 32 bits, most significant byte first
+#   31-18  thermocouple (hot junction) temperature, signed, 0.25C
+#   16     fault, set if any of bits 2-0 is
+#   15-4   internal (cold junction) temperature, signed, 0.0625C
+#   2 short to VCC, 1 short to GND, 0 open circuit
+# a frame with a fault has no thermocouple temperature, it decodes as nan so it can't pass for one
+#   (temp, ref, faults) = max31855.decodeFrame(data)          # one frame from spi_read
+#   (temps, refs, faults) = max31855.decode(frames)           # numpy arrays from a batch of frames
+#
+# the chip takes the thermocouple as a straight 41.276uV/C, a type K isn't quite (about 2C low at 200C).
+# linear=True corrects the temperature with the NIST ITS-90 type K tables: the thermocouple voltage
+# the chip measured plus the voltage for the cold junction temperature gives the hot junction temperature.
+# The NIST polynomials are evaluated once into a 1C table that is interpolated for each reading.
+
+import bisect
+import math
+import numpy as np
+
+FAULT_OC = 0x01     # open circuit
+FAULT_SCG = 0x02    # short to ground
+FAULT_SCV = 0x04    # short to vcc
+FAULT_OTHER = 0x08  # the fault bit without any of the others
+FAULT = 0x10000     # the summary fault bit in the frame
+
+NAMES = { FAULT_OC : 'open circuit', FAULT_SCG : 'short to ground', FAULT_SCV : 'short to vcc', FAULT_OTHER : 'fault' }
+
+SENSITIVITY = 0.041276  # mV per C the chip assumes for a type K
+
+# NIST ITS-90 type K reference function, mV from C
+# below 0C: sum of BELOW[i] t^i, from 0C: sum of ABOVE[i] t^i + A0 exp(A1 (t - A2)^2)
+BELOW = [0.0, 0.394501280250E-01, 0.236223735980E-04, -0.328589067840E-06, -0.499048287770E-08,
+         -0.675090591730E-10, -0.574103274280E-12, -0.310888728940E-14, -0.104516093650E-16,
+         -0.198892668780E-19, -0.163226974860E-22]
+ABOVE = [-0.176004136860E-01, 0.389212049750E-01, 0.185587700320E-04, -0.994575928740E-07,
+         0.318409457190E-09, -0.560728448890E-12, 0.560750590590E-15, -0.320207200030E-18,
+         0.971511471520E-22, -0.121047212750E-25]
+(A0, A1, A2) = (0.118597600000E+00, -0.118343200000E-03, 0.126968600000E+03)
+
+def emf(temp):
+    ''' the NIST type K thermocouple voltage in mV for a temperature in C (-270...1372), numbers or arrays '''
+    temp = np.asarray(temp, dtype=float)
+    below = np.polyval(BELOW[::-1], temp)
+    above = np.polyval(ABOVE[::-1], temp) + A0 * np.exp(A1 * (temp - A2) ** 2)
+    return np.where(temp < 0, below, above)
+
+# the table the readings are interpolated in, the voltage only goes up with the temperature
+TABLE_TEMPS = np.arange(-270.0, 1373.0, 1.0)
+TABLE_EMFS = emf(TABLE_TEMPS)
+# as lists for single readings, numpy is slow for one number
+TEMPS = TABLE_TEMPS.tolist()
+EMFS = TABLE_EMFS.tolist()
+
+def _interp(value, xs, ys):
+    ''' np.interp for one number '''
+    if value != value:
+        return math.nan
+    index = min(max(bisect.bisect_right(xs, value), 1), len(xs) - 1)
+    (x0, x1) = (xs[index - 1], xs[index])
+    value = min(max(value, xs[0]), xs[-1])
+    return ys[index - 1] + (ys[index] - ys[index - 1]) * (value - x0) / (x1 - x0)
+
+def _emf(temp):
+    ''' the table voltage for one temperature, the table steps 1C so the index is the temperature '''
+    if temp != temp:
+        return math.nan
+    position = temp - TEMPS[0]
+    if position <= 0.0:
+        return EMFS[0]
+    if position >= len(TEMPS) - 1:
+        return EMFS[-1]
+    index = int(position)
+    low = EMFS[index]
+    return low + (EMFS[index + 1] - low) * (position - index)
+
+def linearize(temp, ref):
+    ''' the hot junction temperature (C) from the chip's linear temperature and the cold junction (C)
+        numbers or numpy arrays '''
+    if not isinstance(temp, np.ndarray) and not isinstance(ref, np.ndarray):
+        return _interp((temp - ref) * SENSITIVITY + _emf(ref), EMFS, TEMPS)
+    volts = (np.asarray(temp, dtype=float) - ref) * SENSITIVITY + np.interp(ref, TABLE_TEMPS, TABLE_EMFS)
+    return np.interp(volts, TABLE_EMFS, TABLE_TEMPS)
+
+def chipTemp(temp, ref):
+    ''' what the chip reports for a hot junction at temp (C) with the cold junction at ref (C) '''
+    if not isinstance(temp, np.ndarray) and not isinstance(ref, np.ndarray):
+        return ref + (_emf(temp) - _emf(ref)) / SENSITIVITY
+    return ref + (np.interp(temp, TABLE_TEMPS, TABLE_EMFS) - np.interp(ref, TABLE_TEMPS, TABLE_EMFS)) / SENSITIVITY
+
+def faultText(faults):
+    ''' the fault bits as words '''
+    return ", ".join(NAMES[bit] for bit in sorted(NAMES) if faults & bit)
+
+def decodeFrame(data, linear=False):
+    ''' (thermocouple C, cold junction C, fault bits) from one 4 byte frame
+        the thermocouple temperature is nan if the frame has a fault, the fault bits are 0 if not
+        linear=True corrects the thermocouple temperature with the NIST table (see linearize)
+    '''
+    word = int.from_bytes(bytes(data[0:4]), 'big')
+    hot = word >> 18
+    if hot & 0x2000:
+        hot -= 0x4000
+    cold = (word >> 4) & 0xFFF
+    if cold & 0x800:
+        cold -= 0x1000
+    if word & FAULT:
+        return (math.nan, cold * 0.0625, (word & 0x07) or FAULT_OTHER)
+    if linear:
+        return (linearize(hot * 0.25, cold * 0.0625), cold * 0.0625, 0)
+    return (hot * 0.25, cold * 0.0625, 0)
+
+def frames(data):
+    ''' the frames as a uint32 numpy array from bytes (4 per frame), an (n, 4) uint8 array or integers '''
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return np.frombuffer(bytes(data), dtype='>u4').astype(np.uint32)
+    data = np.asarray(data)
+    if data.dtype == np.uint8 and data.shape[-1:] == (4,):
+        return np.ascontiguousarray(data).view('>u4').reshape(data.shape[:-1]).astype(np.uint32)
+    return data.astype(np.uint32)
+
+def decode(data, linear=False):
+    ''' (thermocouple C, cold junction C, fault bits) arrays from a batch of frames (see frames)
+        as decodeFrame for each frame, the thermocouple temperature is nan where there is a fault
+        a single 4 byte frame gives decodeFrame's numbers instead of arrays
+    '''
+    if isinstance(data, (bytes, bytearray, memoryview)) and len(data) == 4:
+        return decodeFrame(data, linear)
+    words = frames(data)
+    hot = (words >> 18).astype(np.int32)
+    hot = np.where(hot & 0x2000, hot - 0x4000, hot) * 0.25
+    cold = ((words >> 4) & 0xFFF).astype(np.int32)
+    cold = np.where(cold & 0x800, cold - 0x1000, cold) * 0.0625
+    fault = (words & FAULT) != 0
+    reasons = (words & 0x07).astype(np.uint8)
+    faults = np.where(fault, np.where(reasons, reasons, FAULT_OTHER), 0).astype(np.uint8)
+    if linear:
+        hot = linearize(hot, cold)
+    return (np.where(fault, np.nan, hot), cold, faults)
@@ -0,0 +1,144 @@
+# Receding horizon model predictive control of the heater duty
+# every sample the controller predicts the plate temperature over the next horizon seconds with an
+# identified plant (sysid.PlantModel), picks the duty moves that best follow a reference ramping to the
+# setpoint no faster than maxrate, and applies the first one. The moves are held over blocks of the
+# horizon so the problem stays small:
+#   minimize |y - r|^2 + moveweight |du|^2 + rateweight |max(0, dy/dt - maxrate)|^2,  outmin <= u <= outmax
+# solved by projected (accelerated) gradient in numpy from the last solution, so a step is well under a
+# millisecond. A slowly adapted offset takes up what the model gets wrong.
+#
+# it has the PidController interface so Reader.pidloop can run it, e.g. for the reflow peak
+#   model = sysid.fit(times, duty, temp)
+#   control.runScript(mpc=mpc.MpcController(model))
+
+import numpy as np
+
+class MpcController():
+    ''' heater duty from a PlantModel, see the top of the file
+        horizon in seconds, blocks the number of duty moves over it, maxrate the fastest rise in F/s
+    '''
+    def __init__(self, model, horizon=20.0, blocks=10, maxrate=2.0, outmin=0.0, outmax=100.0,
+                 moveweight=0.05, rateweight=100.0, iterations=50, offsetgain=0.005):
+        self.model = model
+        self.h = model.h
+        self.steps = max(blocks, int(round(horizon / model.h)))
+        self.blocks = blocks
+        self.length = -(-self.steps // blocks)     # samples per block, rounded up
+        self.maxrate = maxrate
+        self.outmin = outmin
+        self.outmax = outmax
+        self.moveweight = moveweight
+        self.rateweight = rateweight
+        self.iterations = iterations
+        self.offsetgain = offsetgain
+        self.order = len(model.a)
+        self.dead = model.dead
+        self.setpoint = 0.0
+        # the prediction is linear in the state and the moves: y = free @ state + forced @ moves
+        # with state = [temperatures newest first, duties already sent newest first, plant constant]
+        size = self.order + self.dead + 1
+        self.free = np.column_stack([self._simulate(np.eye(size)[i]) for i in range(size)])
+        self.forced = np.column_stack([self._simulate(np.zeros(size), np.eye(blocks)[i]) for i in range(blocks)])
+        # the step size of the gradient method is 1 / the largest curvature of the cost
+        moves = np.eye(blocks) - np.eye(blocks, k=-1)
+        rises = np.diff(np.vstack([np.zeros(blocks), self.forced]), axis=0) / self.h
+        self.moves = moves
+        self.step = 1.0 / (2 * (np.linalg.norm(self.forced, 2) ** 2 + moveweight * np.linalg.norm(moves, 2) ** 2 +
+                                rateweight * np.linalg.norm(rises, 2) ** 2))
+        self.reset()
+
+    def _simulate(self, state, moves=None):
+        ''' the temperatures over the horizon from a state vector and the block moves '''
+        model = self.model
+        temps = list(state[0:self.order])
+        sent = state[self.order:self.order + self.dead]
+        const = state[-1]
+        out = np.zeros(self.steps)
+        for j in range(self.steps):
+            # the duty that reaches the plate at this step was sent dead samples ago
+            index = j - self.dead
+            if index < 0:
+                duty = sent[-index - 1]
+            elif moves is not None:
+                duty = moves[min(index // self.length, self.blocks - 1)]
+            else:
+                duty = 0.0
+            temp = sum(a * t for (a, t) in zip(model.a, temps)) + model.b * duty + const
+            out[j] = temp
+            temps = [temp] + temps[:-1]
+        return out
+
+    def reset(self):
+        ''' forget the history '''
+        self.temps = None                   # measured temperatures newest first
+        self.sent = [self.outmin] * self.dead   # duties sent newest first
+        self.plan = np.full(self.blocks, self.outmin)
+        self.offset = 0.0                   # added to the plant constant
+        self.predicted = None               # the last prediction
+        self.lastTime = None
+        self.output = self.outmin
+
+    def clamp(self, value):
+        return max(self.outmin, min(self.outmax, value))
+
+    def setSetpoint(self, setpoint):
+        self.setpoint = setpoint
+
+    def track(self, output, measurement, now, feedforward=0.0):
+        ''' carry on from a duty the heater has been at for a while '''
+        self.reset()
+        self.output = self.clamp(output)
+        self.sent = [self.output] * self.dead
+        self.plan = np.full(self.blocks, self.output)
+        self.temps = [measurement] * self.order
+        self.lastTime = now
+
+    def update(self, measurement, now, feedforward=0.0):
+        ''' a new measurement at time now (seconds), returns the duty. The feedforward is not used '''
+        steps = 1 if self.lastTime is None else max(1, int(round((now - self.lastTime) / self.h)))
+        self.lastTime = now
+        # the output has been on since the last update
+        self.sent = ([self.output] * steps + self.sent)[0:self.dead]
+        if self.temps is None:
+            self.temps = [measurement] * self.order
+        else:
+            if self.predicted is not None:
+                error = measurement - self.predicted[min(steps, self.steps) - 1]
+                self.offset += self.offsetgain * error / steps
+            self.temps = ([measurement] * min(steps, self.order) + self.temps)[0:self.order]
+        state = np.array(self.temps + self.sent + [self.model.c + self.offset])
+        free = self.free @ state
+        # ramp to the setpoint no faster than maxrate
+        ramp = self.maxrate * self.h * np.arange(1, self.steps + 1)
+        if self.setpoint >= measurement:
+            reference = np.minimum(self.setpoint, measurement + ramp)
+        else:
+            reference = np.maximum(self.setpoint, measurement - ramp)
+        self.plan = self._solve(free, reference, measurement)
+        self.predicted = free + self.forced @ self.plan
+        self.output = float(self.plan[0])
+        return self.output
+
+    def _solve(self, free, reference, measurement):
+        ''' the block moves, accelerated projected gradient from the last plan '''
+        forced = self.forced
+        first = np.zeros(self.blocks)
+        first[0] = self.output
+        plan = self.plan.copy()
+        momentum = plan.copy()
+        factor = 1.0
+        for _ in range(self.iterations):
+            temps = free + forced @ momentum
+            rise = np.maximum(0.0, np.diff(np.concatenate([[measurement], temps])) / self.h - self.maxrate) / self.h
+            # the transpose of the difference, pulled back through the prediction
+            back = rise - np.concatenate([rise[1:], [0.0]])
+            gradient = 2 * (forced.T @ (temps - reference + self.rateweight * back) +
+                            self.moveweight * self.moves.T @ (self.moves @ momentum - first))
+            newplan = np.clip(momentum - self.step * gradient, self.outmin, self.outmax)
+            newfactor = (1 + (1 + 4 * factor * factor) ** 0.5) / 2
+            momentum = newplan + (newplan - plan) * (factor - 1) / newfactor
+            change = np.max(np.abs(newplan - plan))
+            (plan, factor) = (newplan, newfactor)
+            if change < 0.01:
+                break
+        return plan
@@ -0,0 +1,188 @@
+# a PID controller for the heater duty
+# the derivative is taken on the (filtered) measurement so setpoint changes don't kick it,
+# the output is clamped to the duty range and the integrator stops when the output is
+# pinned against a limit (anti-windup). track() sets the integrator so that the controller
+# picks up from a given duty without a bump, e.g. when a fixed duty phase hands over to it
+
+# a feedforward (the duty expected to hold or ramp the setpoint) may be added to the output so the
+# feedback only has to correct what the feedforward gets wrong, see Feedforward and Trajectory
+
+import json
+import os
+
+# gains for the hot plate in percent duty per degree F
+DEFAULT_GAINS = (4.0, 0.02, 40.0)
+# gains saved by the autotuner (autotune.py) are used in place of the defaults
+GAINS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pidgains.json')
+
+# measured steady state (F, duty percent) of the plate, from the readme
+STEADY_DUTY = [(293, 20), (340, 25), (375, 30), (425, 35)]
+# extra duty percent per F/second of setpoint ramp, the plate heats at about 2F/s at full power
+RAMP_GAIN = 50.0
+
+def loadGains(path=GAINS_FILE):
+    ''' the saved (kp, ki, kd), or the defaults if nothing has been saved '''
+    try:
+        with open(path) as fin:
+            values = json.load(fin)
+        return (values['kp'], values['ki'], values['kd'])
+    except (IOError, ValueError, KeyError):
+        return DEFAULT_GAINS
+
+def saveGains(gains, path=GAINS_FILE):
+    ''' save (kp, ki, kd) for the next PidController '''
+    with open(path, 'w') as fout:
+        json.dump({ 'kp' : gains[0], 'ki' : gains[1], 'kd' : gains[2] }, fout, indent=2)
+
+class PidController():
+    ''' output = feedforward + kp * error + ki * integral(error) - kd * d(measurement)/dt
+        gains not given come from loadGains()
+    '''
+    def __init__(self, kp=None, ki=None, kd=None, outmin=0.0, outmax=100.0, dfilter=5.0):
+        if kp is None or ki is None or kd is None:
+            saved = loadGains()
+            kp = saved[0] if kp is None else kp
+            ki = saved[1] if ki is None else ki
+            kd = saved[2] if kd is None else kd
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.outmin = outmin
+        self.outmax = outmax
+        self.dfilter = dfilter      # time constant in seconds of the derivative filter
+        self.setpoint = 0.0
+        self.reset()
+
+    def reset(self):
+        ''' forget the history '''
+        self.integral = 0.0         # the integral term in output units
+        self.derivative = 0.0       # filtered rate of change of the measurement
+        self.last = None            # last measurement
+        self.lastTime = None
+        self.output = self.outmin
+
+    def clamp(self, value):
+        return max(self.outmin, min(self.outmax, value))
+
+    def setSetpoint(self, setpoint):
+        self.setpoint = setpoint
+
+    def track(self, output, measurement, now, feedforward=0.0):
+        ''' bumpless transfer: the next update continues from output at this measurement '''
+        self.integral = self.clamp(output) - feedforward - self.kp * (self.setpoint - measurement)
+        self.integral = max(-self.outmax, min(self.outmax, self.integral))
+        self.derivative = 0.0
+        self.last = measurement
+        self.lastTime = now
+        self.output = self.clamp(output)
+
+    def update(self, measurement, now, feedforward=0.0):
+        ''' a new measurement at time now (seconds), returns the output '''
+        error = self.setpoint - measurement
+        dt = 0.0 if self.lastTime is None else now - self.lastTime
+        if dt > 0:
+            rate = (measurement - self.last) / dt
+            self.derivative += (rate - self.derivative) * dt / (self.dfilter + dt)
+        proportional = feedforward + self.kp * error
+        integral = self.integral + self.ki * error * dt
+        output = proportional + integral - self.kd * self.derivative
+        # only integrate if that doesn't push further past a limit
+        # the integral may go negative to take back some of the feedforward
+        if not ((output > self.outmax and error > 0) or (output < self.outmin and error < 0)):
+            self.integral = max(-self.outmax, min(self.outmax, integral))
+        self.output = self.clamp(proportional + self.integral - self.kd * self.derivative)
+        self.last = measurement
+        self.lastTime = now
+        return self.output
+
+class CoolingController():
+    ''' the fan rate that holds a cooling rate, a pi controller on the measured cooling rate
+        rate is in C per second as the solder paste specs give it, the fan cools at 1.6F/s (0.9C/s) at most
+        so a faster rate just runs it flat out. The fan doesn't turn below fanmin
+        so it is either off or at fanmin or more, it goes off when the controller asks for less than
+        half of fanmin and back on when it asks for fanmin
+    '''
+    def __init__(self, rate=0.8, kp=40.0, ki=4.0, fanmin=35.0):
+        self.pid = PidController(kp, ki, 0.0)
+        self.fanmin = fanmin
+        self.setRate(rate)
+        self.reset()
+
+    def reset(self):
+        self.pid.reset()
+        self.output = 0.0
+
+    def setRate(self, rate):
+        ''' the cooling rate in C per second '''
+        self.rate = rate
+        self.pid.setSetpoint(rate * 9 / 5)
+
+    def update(self, cooling, now):
+        ''' the measured cooling rate (F per second, positive when cooling) at time now, returns the fan rate '''
+        demand = self.pid.update(cooling, now)
+        if demand >= self.fanmin or (self.output and demand >= self.fanmin / 2):
+            self.output = max(self.fanmin, demand)
+        else:
+            self.output = 0.0
+        return self.output
+
+class Feedforward():
+    ''' the heater duty expected to hold the plate at a temperature, plus some for a ramp
+        the duty is interpolated in a table of (temperature, steady duty) measurements
+    '''
+    def __init__(self, table=STEADY_DUTY, ambient=77.0, rampgain=RAMP_GAIN):
+        self.table = [(ambient, 0.0)] + sorted((t, d) for (t, d) in table if t > ambient)
+        self.rampgain = rampgain
+
+    def steady(self, temp):
+        ''' the duty that holds temp, straight line extrapolation past the ends of the table '''
+        table = self.table
+        index = 1
+        while index < len(table) - 1 and temp > table[index][0]:
+            index += 1
+        (t0, d0) = table[index - 1]
+        (t1, d1) = table[index]
+        return max(0.0, d0 + (d1 - d0) * (temp - t0) / (t1 - t0))
+
+    def duty(self, setpoint, slope=0.0):
+        ''' duty for a setpoint moving at slope (F/s) '''
+        return self.steady(setpoint) + self.rampgain * slope
+
+class Trajectory():
+    ''' a setpoint that follows straight lines between (time, temperature) points '''
+    def __init__(self, points):
+        self.points = sorted(points)
+
+    def at(self, elapsed):
+        ''' the (setpoint, slope) at elapsed seconds from the start '''
+        points = self.points
+        if elapsed <= points[0][0]:
+            return (points[0][1], 0.0)
+        for index in range(1, len(points)):
+            (t0, v0) = points[index - 1]
+            (t1, v1) = points[index]
+            if elapsed <= t1:
+                slope = (v1 - v0) / (t1 - t0) if t1 > t0 else 0.0
+                return (v0 + slope * (elapsed - t0), slope)
+        return (points[-1][1], 0.0)
+
+    def duration(self):
+        return self.points[-1][0]
+
+def buildTrajectory(start, steps):
+    ''' a Trajectory from a starting temperature and a list of steps, each
+        {"to": temperature, "rate": F per second} (a ramp) or {"hold": seconds} (a soak)
+    '''
+    now = 0.0
+    temp = start
+    points = [(now, temp)]
+    for step in steps:
+        if 'hold' in step:
+            now += step['hold']
+        else:
+            if not step['rate'] > 0:
+                raise ValueError("A ramp to {0} needs a rate above 0".format(step['to']))
+            now += abs(step['to'] - temp) / step['rate']
+            temp = step['to']
+        points.append((now, temp))
+    return Trajectory(points)
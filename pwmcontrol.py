@@ -1,6 +1,5 @@
 from graphicslib import pighelp
 import time
-import pigpio
 import math
 
 # this code was taken from the Adafruit_PWM_Servo_Driver
@@ -25,13 +24,19 @@ class PwmDevice():
     __RESTART            = 0x80
     __SLEEP              = 0x10
     __ALLCALL            = 0x01
+    __AI                 = 0x20    # register auto-increment
     __OUTDRV             = 0x04
 
     def __init__(self):
         self.i2c = pighelp.PIGHELPER.geti2cPwm()
-        self.setAllPWM(0, 0)
+        # shadow copy of the LED registers (None = unknown) so unchanged values aren't resent
+        self.shadow = [None] * 256
+        self.hits = 0       # writes skipped because the chip already had the values
+        self.misses = 0     # writes sent
+        # auto-increment before the first block write, without it only the first register is written
         self.write8(self.__MODE2, self.__OUTDRV)
-        self.write8(self.__MODE1, self.__ALLCALL)
+        self.write8(self.__MODE1, self.__ALLCALL | self.__AI)
+        self.setAllPWM(0, 0)
         time.sleep(0.005)                             # wait for oscillator
         mode1 = self.readU8(self.__MODE1)
         mode1 = mode1 & ~self.__SLEEP                 # wake up (reset sleep)
@@ -43,6 +48,26 @@ class PwmDevice():
         ''' encapsulating the i2c write request '''
         pighelp.PIGHELPER.Api.i2c_write_byte_data(self.i2c, register, value)
 
+    def writeBlock(self, register, values) :
+        ''' write consecutive registers in one i2c transaction (needs auto-increment) '''
+        pighelp.PIGHELPER.Api.i2c_write_i2c_block_data(self.i2c, register, values)
+
+    def writeLeds(self, register, values) :
+        ''' write LED registers, only sending the part that differs from the shadow copy '''
+        changed = [i for i in range(0, len(values)) if self.shadow[register + i] != values[i]]
+        if not changed :
+            self.hits += 1
+            return
+        self.misses += 1
+        first = changed[0]
+        last = changed[-1] + 1
+        self.writeBlock(register + first, values[first:last])
+        self.shadow[register + first:register + last] = values[first:last]
+
+    def resync(self):
+        ''' forget the shadow registers so the next write of every channel goes to the chip '''
+        self.shadow = [None] * 256
+
     def readU8(self, register) :
         ''' encapsulating the i2c read request '''
         return pighelp.PIGHELPER.Api.i2c_read_byte_data(self.i2c, register)
@@ -67,17 +92,23 @@ class PwmDevice():
 
     def setPWM(self, channel, on, off):
         "Sets a single PWM channel. Note that there's a special bit at H (8) for full on"
-        self.write8(self.__LED0_ON_L+4*channel, on & 0xFF)
-        self.write8(self.__LED0_ON_H+4*channel, on >> 8)
-        self.write8(self.__LED0_OFF_L+4*channel, off & 0xFF)
-        self.write8(self.__LED0_OFF_H+4*channel, off >> 8)
+        self.setPWMs(channel, [(on, off)])
+
+    def setPWMs(self, channel, values):
+        "Sets a run of adjacent PWM channels starting at channel from a list of (on, off)"
+        # an smbus block is at most 32 bytes so at most 8 channels per write
+        for start in range(0, len(values), 8):
+            block = []
+            for (on, off) in values[start:start + 8]:
+                block += [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+            self.writeLeds(self.__LED0_ON_L+4*(channel + start), block)
 
     def setAllPWM(self, on, off):
         "Sets a all PWM channels"
-        self.write8(self.__ALL_LED_ON_L, on & 0xFF)
-        self.write8(self.__ALL_LED_ON_H, on >> 8)
-        self.write8(self.__ALL_LED_OFF_L, off & 0xFF)
-        self.write8(self.__ALL_LED_OFF_H, off >> 8)
+        values = [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+        self.writeBlock(self.__ALL_LED_ON_L, values)
+        self.misses += 1
+        self.shadow[self.__LED0_ON_L:self.__LED0_ON_L + 64] = values * 16
 
 class PwmControl():
     ''' a pwm controller, set the device to pwmdevice instance and channel to 0...3 '''
@@ -106,27 +137,38 @@ class PwmControl():
         self.PWMpin = pwm
         self.IN1pin = in1
         self.IN2pin = in2
-        self.setPolarity(0) # permanently set as a DC supply with + on the left
-        self.setSpeed(0) # and default to turn off
+        # permanently set as a DC supply with + on the left and default to turn off
+        # the three pins are adjacent so this is a single write
+        self.setPins({ self.IN2pin : 0, self.IN1pin : 1, self.PWMpin : 0 })
+
+    def pinValue(self, value):
+        ''' the (on, off) pair for a pin on or off. there's a special bit in the register at 4096 for on/off '''
+        return (4096, 0) if value else (0, 4096)
 
     def setPin(self, pin, value):
-        ''' set a pin on or off. there's a special bit in the register at 4096 for on/off '''
-        if (value == 0):
-            self.device.setPWM(pin, 0, 4096)
-        elif (value == 1):
-            self.device.setPWM(pin, 4096, 0)
+        ''' set a pin on or off '''
+        if value in (0, 1):
+            self.device.setPWM(pin, *self.pinValue(value))
+
+    def setPins(self, values):
+        ''' set several pins on or off from a {pin : value} dict, adjacent pins share a write '''
+        pins = sorted(values)
+        start = 0
+        while start < len(pins):
+            end = start + 1
+            while end < len(pins) and pins[end] == pins[end - 1] + 1:
+                end += 1
+            self.device.setPWMs(pins[start], [self.pinValue(values[pin]) for pin in pins[start:end]])
+            start = end
 
     def setPolarity(self, command):
         ''' set the output polarity '''
         if (command == 0): # +-
-            self.setPin(self.IN2pin, 0)
-            self.setPin(self.IN1pin, 1)
+            self.setPins({ self.IN2pin : 0, self.IN1pin : 1 })
         elif (command == 1): # -+
-            self.setPin(self.IN1pin, 0)
-            self.setPin(self.IN2pin, 1)
+            self.setPins({ self.IN1pin : 0, self.IN2pin : 1 })
         elif (command == 2): # 00
-            self.setPin(self.IN1pin, 0)
-            self.setPin(self.IN2pin, 0)
+            self.setPins({ self.IN1pin : 0, self.IN2pin : 0 })
 
     def setSpeed(self, speed):
         ''' set the pwm on/off values, i.e. speed in range [0...100] '''
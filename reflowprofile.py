@@ -0,0 +1,178 @@
+# Reflow profiles loaded from a file instead of coded in runScript
+# a profile is a json file with a name and a list of phases run in order. Temperatures are F
+# and times are seconds, as everywhere else in control.py
+#
+# {"name": "leaded", "phases": [
+#    {"name": "preheat", "setpoint": 300, "rate": 2.0, "target": 295},
+#    {"name": "soak", "setpoint": 320, "limit": 90, "fan": 0},
+#    {"name": "reflow", "duty": 100, "target": 385},
+#    {"name": "cool", "duty": 0, "fan": 100, "target": 150, "limit": 300}]}
+#
+# phase entries
+#   name      : shown in the log
+#   duty      : a fixed heater duty 0...100, or
+#   setpoint  : a temperature for the pid controller
+#   rate      : F per second (above 0) the pid setpoint ramps at from the temperature at the phase start
+#   curve     : instead of setpoint, a list of ramps {"to": F, "rate": F/s} and soaks {"hold": seconds}
+#               the rate is a speed (above 0) up or down to the temperature
+#               the pid setpoint follows from the temperature at the phase start
+#   feedforward : true to add the duty expected for the setpoint (pidcontrol.Feedforward) to the pid
+#   fan       : fan rate 0...100 for the phase (unchanged if not given)
+#   target    : the phase ends when the temperature gets to this (from above or below)
+#   lead      : seconds of the rate of rise still to come when the heater goes off, a rising target
+#               phase ends early by that much so the peak lands on the target (see control.Reader.rloop)
+#   limit     : the phase ends after this many seconds
+#   cycletime : heater switching cycle (default 1)
+# every phase needs a target or a limit, or a curve (it ends with the curve)
+# the profile may have a "calibration" list of [F, steady duty] pairs for the feedforward
+#
+#   import reflowprofile
+#   reflowprofile.runProfile(reflowprofile.loadProfile('profiles/default.json'))
+
+import json
+import clocks
+import control
+import pidcontrol
+
+class Phase():
+    ''' one step of a reflow profile '''
+    def __init__(self, values):
+        self.name = values.get('name', 'phase')
+        self.duty = values.get('duty')
+        self.setpoint = values.get('setpoint')
+        self.rate = values.get('rate')
+        self.curve = values.get('curve')
+        self.feedforward = values.get('feedforward', False)
+        self.fan = values.get('fan')
+        self.target = values.get('target')
+        self.lead = values.get('lead', 0)
+        self.limit = values.get('limit')
+        self.cycletime = values.get('cycletime', 1)
+        if [self.duty, self.setpoint, self.curve].count(None) != 2:
+            raise ValueError("Phase '{0}' needs one of duty, setpoint or curve".format(self.name))
+        if self.target is None and self.limit is None and self.curve is None:
+            raise ValueError("Phase '{0}' needs a target or a limit".format(self.name))
+        if self.rate is not None and not self.rate > 0:
+            raise ValueError("Phase '{0}' needs a rate above 0".format(self.name))
+        for step in self.curve or []:
+            if 'hold' in step:
+                if not step['hold'] >= 0:
+                    raise ValueError("Phase '{0}' has a hold under 0 in its curve".format(self.name))
+            elif 'to' not in step or not step.get('rate', 0) > 0:
+                raise ValueError("Phase '{0}' curve steps need a hold or a to with a rate above 0".format(self.name))
+
+    def usesPid(self):
+        return self.duty is None
+
+class ReflowProfile():
+    ''' a named list of phases '''
+    def __init__(self, values):
+        self.name = values.get('name', 'profile')
+        self.phases = [Phase(item) for item in values['phases']]
+        self.calibration = values.get('calibration')
+
+def loadProfile(path):
+    ''' read a profile from a json file '''
+    with open(path) as fin:
+        return ReflowProfile(json.load(fin))
+
+class ProfileRunner():
+    ''' runs the phases of a profile with one sampling loop for all of them '''
+    def __init__(self, profile, runner, reader, pid=None, clock=None):
+        self.profile = profile
+        self.runner = runner
+        self.reader = reader
+        self.pid = pid if pid is not None else pidcontrol.PidController()
+        self.clock = clock if clock is not None else clocks.CLOCK
+        if profile.calibration:
+            self.feedforward = pidcontrol.Feedforward([tuple(item) for item in profile.calibration])
+        else:
+            self.feedforward = pidcontrol.Feedforward()
+        self.log = []   # (time, phase name, temperature, setpoint, duty) per sample
+
+    def run(self):
+        self.pid.reset()
+        for phase in self.profile.phases:
+            print("Phase " + phase.name)
+            self.runPhase(phase)
+        self.runner.setCycle(0, self.runner.cycletime)
+
+    def runPhase(self, phase):
+        started = self.clock.time()
+        starttemp = self.reader.readtemp()
+        rising = phase.target is None or phase.target >= starttemp
+        if phase.fan is not None:
+            control.setFanRate(phase.fan)
+        curve = pidcontrol.buildTrajectory(starttemp, phase.curve) if phase.curve else None
+        setpoint = None
+        if not phase.usesPid():
+            self.runner.setCycle(phase.duty, phase.cycletime)
+        else:
+            # pick up from whatever the heater is doing now
+            (setpoint, slope) = self.setpoint(phase, curve, starttemp, 0)
+            self.pid.setSetpoint(setpoint)
+            self.pid.track(self.runner.percent, starttemp, started, self.feed(phase, setpoint, slope))
+        rate = control.RateEstimator()
+        position = 0
+        while True:
+            self.clock.sleep(.1)
+            temp = self.reader.readtemp()
+            now = self.clock.time()
+            elapsed = now - started
+            if phase.usesPid():
+                (setpoint, slope) = self.setpoint(phase, curve, starttemp, elapsed)
+                self.pid.setSetpoint(setpoint)
+                self.reader.pidstep(self.runner, self.pid, temp, now, phase.cycletime, self.feed(phase, setpoint, slope))
+            rise = max(0.0, rate.add(now, temp)) * phase.lead if (rising and phase.lead) else 0.0
+            self.log.append((now, phase.name, temp, setpoint, self.runner.percent))
+            position = position + 1
+            self.reader.printduty(position, now - self.reader.starttime, round(temp, 1), self.runner.percent, phase.name)
+            if phase.target is not None and (temp + rise >= phase.target if rising else temp <= phase.target):
+                print("At target temperature.")
+                break
+            if phase.limit is not None and elapsed > phase.limit:
+                print("At target time.")
+                break
+            if curve is not None and phase.target is None and phase.limit is None and elapsed > curve.duration():
+                print("At end of curve.")
+                break
+
+    def setpoint(self, phase, curve, starttemp, elapsed):
+        ''' the pid (setpoint, slope), from the curve or ramped at phase.rate from the starting temperature '''
+        if curve is not None:
+            return curve.at(elapsed)
+        if phase.rate is None:
+            return (phase.setpoint, 0.0)
+        if phase.setpoint >= starttemp:
+            ramp = starttemp + phase.rate * elapsed
+            return (ramp, phase.rate) if ramp < phase.setpoint else (phase.setpoint, 0.0)
+        ramp = starttemp - phase.rate * elapsed
+        return (ramp, -phase.rate) if ramp > phase.setpoint else (phase.setpoint, 0.0)
+
+    def feed(self, phase, setpoint, slope):
+        ''' the feedforward duty for the phase '''
+        return self.feedforward.duty(setpoint, slope) if phase.feedforward else 0.0
+
+def runProfile(profile, clock=None, pid=None, waves=False, quantum=0, sampled=False):
+    ''' run a profile (a ReflowProfile or the path of a profile file) on the hot plate
+        sampled=True reads the thermocouple in a sampler thread (see control.Reader)
+    '''
+    if not isinstance(profile, ReflowProfile):
+        profile = loadProfile(profile)
+    clock = clock if clock is not None else clocks.CLOCK
+    trun = control.WaveRunner(clock) if waves else control.TempRunner(clock, quantum)
+    rdr = control.Reader(clock, sampled)
+    trun.setCycle(0, 1)
+    trun.start()
+    prun = ProfileRunner(profile, trun, rdr, pid, clock)
+    try:
+        prun.run()
+    finally:
+        control.setFanRate(0)
+        trun.stop()
+        clock.join(trun)
+        rdr.close()
+    print(rdr.oled.LatencyReport())
+    if hasattr(trun, 'stats'):
+        print(trun.stats.report())
+    return prun
@@ -0,0 +1,120 @@
+# A thread that reads the thermocouple at the MAX31855 conversion rate
+# every reading goes into a fixed size ring buffer of (monotonic time, temperature F, cold junction F,
+# fault bits) so every loop shares one stream of readings instead of reading the chip itself
+#   samples = sampler.Sampler(control.getSpi())
+#   samples.start()
+#   (when, temp, ref, faults) = samples.latest()
+#   (times, temps, refs, faults) = samples.buffer.window(10)   # numpy arrays of the last 10 seconds
+
+import threading
+import numpy as np
+import clocks
+import max31855
+from graphicslib import pighelp
+
+# the MAX31855 takes up to 100ms for a conversion, reading faster just repeats it
+CONVERSION = 0.1
+
+class RingBuffer():
+    ''' the newest size samples in numpy arrays, oldest overwritten first '''
+    def __init__(self, size=6000):
+        self.size = size
+        self.times = np.zeros(size)
+        self.temps = np.zeros(size)
+        self.refs = np.zeros(size)
+        self.faults = np.zeros(size, dtype=np.uint8)
+        self.count = 0          # samples ever added
+        self.lock = threading.Lock()
+
+    def append(self, when, temp, ref, faults):
+        with self.lock:
+            slot = self.count % self.size
+            self.times[slot] = when
+            self.temps[slot] = temp
+            self.refs[slot] = ref
+            self.faults[slot] = faults
+            self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def latest(self):
+        ''' the newest (time, temperature, cold junction, faults) or None if there are none yet '''
+        with self.lock:
+            if not self.count:
+                return None
+            slot = (self.count - 1) % self.size
+            return (float(self.times[slot]), float(self.temps[slot]), float(self.refs[slot]), int(self.faults[slot]))
+
+    def last(self, count):
+        ''' (times, temperatures, cold junctions, faults) arrays of the newest count samples, oldest first '''
+        with self.lock:
+            count = max(0, min(count, self.count, self.size))
+            slots = np.arange(self.count - count, self.count) % self.size
+            return (self.times[slots], self.temps[slots], self.refs[slots], self.faults[slots])
+
+    def window(self, seconds):
+        ''' the arrays (as for last) of the samples in the last seconds before the newest one '''
+        with self.lock:
+            count = min(self.count, self.size)
+            slots = np.arange(self.count - count, self.count) % self.size
+            if count:
+                slots = slots[self.times[slots] >= self.times[slots[-1]] - seconds]
+            return (self.times[slots], self.temps[slots], self.refs[slots], self.faults[slots])
+
+def decode(data):
+    ''' (temperature F, cold junction F, fault bits) from a MAX31855 frame, the temperature is nan on a fault
+        and corrected with the NIST type K table '''
+    (temp, ref, faults) = max31855.decodeFrame(data, linear=True)
+    return (32 + temp * 9 / 5, 32 + ref * 9 / 5, faults)
+
+class Sampler(threading.Thread):
+    ''' reads the thermocouple on spi handle hspi every period seconds into a RingBuffer
+        the reads run on absolute deadlines so the samples stay evenly spaced
+    '''
+    def __init__(self, hspi, clock=None, period=CONVERSION, size=6000):
+        threading.Thread.__init__(self)
+        self.hspi = hspi
+        self.clock = clock if clock is not None else clocks.CLOCK
+        self.period = period
+        self.buffer = RingBuffer(size)
+        self.running = True
+        self.wake = self.clock.event()
+        self.reads = 0
+        self.onfault = None     # called with the fault bits of a reading that has any
+
+    def start(self):
+        ''' attach to the clock before the thread starts sleeping on it '''
+        self.clock.attach()
+        threading.Thread.start(self)
+
+    def run(self):
+        ''' overriden, call start() to run this thread '''
+        try:
+            api = pighelp.PIGHELPER.Api
+            deadline = self.clock.monotonic()
+            while self.running:
+                (_, data) = api.spi_read(self.hspi, 4)
+                self.reads += 1
+                (temp, ref, faults) = decode(data)
+                self.buffer.append(self.clock.monotonic(), temp, ref, faults)
+                if faults and self.onfault is not None:
+                    self.onfault(faults)
+                deadline += self.period
+                now = self.clock.monotonic()
+                if now > deadline:
+                    deadline = now  # late, carry on from here
+                else:
+                    self.clock.wait(self.wake, deadline - now)
+        except Exception as ex:
+            print("Sampler error: " + str(ex))
+        self.clock.detach()
+
+    def stop(self):
+        ''' asynchronous stop '''
+        self.running = False
+        self.wake.set()
+
+    def latest(self):
+        ''' the newest (time, temperature, cold junction, faults) without waiting, None before the first read '''
+        return self.buffer.latest()
@@ -0,0 +1,50 @@
+# Run the reflow code against the simulated hardware and a thermal model of the plate
+# on a virtual clock, so a whole run takes well under a second instead of eight minutes.
+#   python3 simulate.py
+# or from python
+#   import simulate
+#   plate = simulate.simulate()
+#   plate.trace     # (time, plate C, heater, fan) for the run
+
+import os
+os.environ.setdefault('PIGPIO_SIM', '1')
+
+import time
+import clocks
+from graphicslib import pighelp, pigsim
+import control
+import max31855
+
+# seconds a default run may take, tests/test_simulate.py holds the simulator to it
+BUDGET = 0.8
+
+def makePlate(clock, ambient=25.0):
+    ''' attach a fresh plate model to the simulated devices and to the clock '''
+    api = pighelp.PIGHELPER.Api
+    # the heater is on the pwm chip (TempRunner) or HOTBIT directly (WaveRunner)
+    plate = pigsim.SimPlate(lambda: max(api.pwm.duty(control.VoltagePin.PWMpin), api.duty(control.HOTBIT)),
+                            lambda: api.pwm.duty(control.FanMotor.PWMpin), ambient)
+    # the chip reads the thermocouple voltage as if it were linear
+    api.thermocouple.source = lambda: max31855.chipTemp(plate.temp, api.thermocouple.ref)
+    clock.addListener(plate.step)
+    return plate
+
+def simulate(script=None, **options):
+    ''' run script(clock, **options) (default control.runScript) on a virtual clock and return the plate '''
+    clock = clocks.VirtualClock()
+    plate = makePlate(clock)
+    (script or control.runScript)(clock, **options)
+    return plate
+
+def timed(script=None, **options):
+    ''' (plate, seconds the run took) for simulate(script, **options) '''
+    started = time.perf_counter()
+    plate = simulate(script, **options)
+    return (plate, time.perf_counter() - started)
+
+if __name__ == '__main__':
+    (plate, elapsed) = timed()
+    peak = max(item[1] for item in plate.trace)
+    print("Simulated {0:.0f} s in {1:.2f} s, peak {2:.1f} C".format(plate.trace[-1][0], elapsed, peak))
+    if elapsed > BUDGET:
+        print("Over the {0:.2f} s budget".format(BUDGET))
@@ -0,0 +1,134 @@
+# Fit a thermal model of the hot plate to logged heater duty and temperature traces
+# the fit is a linear least squares (numpy) over an ARX model for each candidate dead time
+#   first order plus dead time   T[k+1] = a T[k] + b u[k-d] + c
+#   second order (two mass)      T[k+1] = a1 T[k] + a2 T[k-1] + b u[k-d] + c
+# and gives the plant gain (F per % duty), time constants and dead time in seconds.
+#
+# traces come from a file of "time duty temperature" rows (commas or spaces), from the
+# "time ::: temperature @ duty%" lines that pidloop/runProfile print, or from a ProfileRunner log
+#   python3 sysid.py run.log
+
+import math
+import re
+import numpy as np
+
+class PlantModel():
+    ''' an identified model, discrete at the sample time h (seconds) '''
+    def __init__(self, h, a, b, c, dead, residual):
+        self.h = h
+        self.a = a              # list of the temperature coefficients, newest first
+        self.b = b
+        self.c = c
+        self.dead = dead        # dead time in samples
+        self.residual = residual    # rms one step error in F
+        total = 1.0 - sum(a)
+        self.gain = b / total if total else float('inf')    # F per % duty at steady state
+        self.ambient = c / total if total else float('nan')  # temperature at 0% duty
+        self.taus = self._taus()
+
+    def _taus(self):
+        ''' continuous time constants from the discrete poles '''
+        if len(self.a) == 1:
+            roots = [self.a[0]]
+        else:
+            roots = np.roots([1.0, -self.a[0], -self.a[1]])
+        taus = []
+        for root in roots:
+            root = abs(root)
+            taus.append(-self.h / math.log(root) if 0 < root < 1 else float('inf'))
+        return sorted(taus, reverse=True)
+
+    @property
+    def deadTime(self):
+        return self.dead * self.h
+
+    @property
+    def tau(self):
+        return self.taus[0]
+
+    @property
+    def lead(self):
+        ''' seconds of the current rate of rise still to come after the heater goes off
+            the dead time plus the faster time constants (the heater element) '''
+        if len(self.a) == 1 or self.a[0] ** 2 + 4 * self.a[1] < 0:
+            return self.deadTime     # complex poles have no faster time constant
+        return self.deadTime + sum(tau for tau in self.taus[1:] if tau != float('inf'))
+
+    def step(self, history, duty):
+        ''' the next temperature from the recent temperatures (newest first) and the delayed duty '''
+        return sum(a * t for (a, t) in zip(self.a, history)) + self.b * duty + self.c
+
+    def report(self):
+        taus = ", ".join("{0:.1f}".format(tau) for tau in self.taus)
+        return ("gain {0:.3f} F/%, time constants {1} s, dead time {2:.1f} s, ambient {3:.1f} F, rms error {4:.3f} F"
+                .format(self.gain, taus, self.deadTime, self.ambient, self.residual))
+
+def resample(times, duty, temp, h=0.1):
+    ''' put a trace on an even time grid of h seconds '''
+    times = np.asarray(times, dtype=float)
+    grid = np.arange(times[0], times[-1], h)
+    # the duty is held between samples, the temperature interpolated
+    index = np.searchsorted(times, grid, side='right') - 1
+    return grid, np.asarray(duty, dtype=float)[index], np.interp(grid, times, np.asarray(temp, dtype=float))
+
+def fit(times, duty, temp, order=1, maxdead=30.0, h=0.1):
+    ''' fit a PlantModel of the given order (1 or 2) trying dead times up to maxdead seconds '''
+    if len(times) < 2 or len(duty) != len(times) or len(temp) != len(times):
+        raise ValueError('Trace is too short to fit')
+    if min(duty) == max(duty):
+        raise ValueError('The duty never changes so the trace has no gain to fit')
+    (_, u, y) = resample(times, duty, temp, h)
+    maxd = int(maxdead / h)
+    start = maxd + order        # first sample that has all its regressors
+    if len(y) <= start + 10:
+        raise ValueError('Trace is too short to fit')
+    target = y[start:]
+    columns = [y[start - 1 - i:len(y) - 1 - i] for i in range(0, order)]
+    best = None
+    for dead in range(0, maxd + 1):
+        delayed = u[start - 1 - dead:len(u) - 1 - dead]
+        regress = np.column_stack(columns + [delayed, np.ones(len(target))])
+        (coeffs, residual, _, _) = np.linalg.lstsq(regress, target, rcond=None)
+        error = float(residual[0]) if len(residual) else float(np.sum((regress @ coeffs - target) ** 2))
+        if best is None or error < best[0]:
+            best = (error, dead, coeffs)
+    (error, dead, coeffs) = best
+    rms = math.sqrt(error / len(target))
+    return PlantModel(h, [float(a) for a in coeffs[0:order]], float(coeffs[order]), float(coeffs[order + 1]), dead, rms)
+
+LINE = re.compile(r'^\s*([-\d.]+)\s*:::.*?([-\d.]+)\s*@\s*([-\d.]+)%')
+
+def parseLines(lines):
+    ''' (times, duty, temperature) from "t ::: temp @ duty%" lines or "t duty temp" rows '''
+    times, duty, temp = [], [], []
+    for line in lines:
+        match = LINE.match(line)
+        if match:
+            times.append(float(match.group(1)))
+            temp.append(float(match.group(2)))
+            duty.append(float(match.group(3)))
+            continue
+        fields = line.replace(',', ' ').split()
+        if len(fields) == 3:
+            try:
+                values = [float(item) for item in fields]
+            except ValueError:
+                continue
+            times.append(values[0])
+            duty.append(values[1])
+            temp.append(values[2])
+    return times, duty, temp
+
+def fromLog(log):
+    ''' (times, duty, temperature) from a ProfileRunner log '''
+    return [item[0] for item in log], [item[4] for item in log], [item[2] for item in log]
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 2:
+        print('usage: python3 sysid.py <trace file>')
+    else:
+        with open(sys.argv[1]) as fin:
+            (times, duty, temp) = parseLines(fin)
+        for order in (1, 2):
+            print("order {0}: ".format(order) + fit(times, duty, temp, order).report())
@@ -0,0 +1,41 @@
+# the TempRunner's quantum (sigma-delta) switching, against the simulator
+#   python3 -m pytest -q
+
+import os
+import random
+import sys
+
+os.environ.setdefault('PIGPIO_SIM', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import control
+import simulate
+
+def test_quantum_spacing(monkeypatch):
+    ''' settings that change faster than the quantum never switch the relay faster than it '''
+    quantum = 1.0
+    rand = random.Random(13)
+    switched = []       # (time, value) at the relay
+    def script(clock):
+        monkeypatch.setattr(control, 'setVoltage', lambda amt: switched.append((clock.time(), 1 if amt else 0)))
+        control.clearTrip()
+        runner = control.TempRunner(clock, quantum)
+        runner.setCycle(0, 1)
+        runner.start()
+        try:
+            for _ in range(400):
+                runner.setCycle(rand.choice([0, 100, rand.uniform(0, 100)]), 1)
+                clock.sleep(rand.choice([0.05, 0.1, 0.3, 0.7, 1.5]))
+            runner.setCycle(0, 1)
+            clock.sleep(2 * quantum)
+        finally:
+            runner.stop()
+            clock.join(runner)
+    simulate.simulate(script)
+    changes = [switched[0]]
+    for item in switched[1:]:
+        if item[1] != changes[-1][1]:
+            changes.append(item)
+    assert len(changes) > 50
+    gaps = [b[0] - a[0] for (a, b) in zip(changes, changes[1:])]
+    assert min(gaps) >= quantum - 1e-9
@@ -0,0 +1,70 @@
+# MAX31855 frame decoding and the heater trip on a thermocouple fault, against the simulator
+#   python3 -m pytest -q
+
+import math
+import os
+import sys
+
+os.environ.setdefault('PIGPIO_SIM', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+import control
+import max31855
+import sampler
+import simulate
+from graphicslib import pighelp, pigsim
+
+def frame(temp, ref, faults=0):
+    chip = pigsim.SimMax31855(temp, ref)
+    chip.faults = faults
+    return bytes(chip.frame())
+
+def test_signs():
+    assert max31855.decodeFrame(frame(25.0, 25.0)) == (25.0, 25.0, 0)
+    assert max31855.decodeFrame(frame(-12.25, -3.5)) == (-12.25, -3.5, 0)
+    assert max31855.decodeFrame(frame(1023.75, 127.9375)) == (1023.75, 127.9375, 0)
+    assert max31855.decodeFrame(frame(-270.0, -55.0)) == (-270.0, -55.0, 0)
+
+def test_faults():
+    (temp, ref, faults) = max31855.decodeFrame(frame(300.0, 20.0, max31855.FAULT_OC))
+    assert math.isnan(temp) and ref == 20.0 and faults == max31855.FAULT_OC
+    (temp, _, faults) = max31855.decodeFrame(frame(300.0, -20.0, max31855.FAULT_SCG | max31855.FAULT_SCV))
+    assert math.isnan(temp) and faults == max31855.FAULT_SCG | max31855.FAULT_SCV
+    # the summary bit alone
+    word = int.from_bytes(frame(300.0, 20.0), 'big') | max31855.FAULT
+    assert max31855.decodeFrame(word.to_bytes(4, 'big'))[2] == max31855.FAULT_OTHER
+
+def test_batch():
+    cases = [(25.0, 25.0, 0), (-12.25, -3.5, 0), (300.0, 20.0, max31855.FAULT_OC), (1023.75, -55.0, 0)]
+    data = b''.join(frame(*case) for case in cases)
+    for batch in (data, np.frombuffer(data, np.uint8).reshape(-1, 4)):
+        (temps, refs, faults) = max31855.decode(batch)
+        for (index, (temp, ref, fault)) in enumerate(cases):
+            one = max31855.decodeFrame(data[4 * index:4 * index + 4])
+            assert refs[index] == ref == one[1] and faults[index] == fault == one[2]
+            assert (math.isnan(temps[index]) and fault) or temps[index] == temp == one[0]
+
+@pytest.mark.parametrize('sampled', [False, True])
+def test_fault_trips_heater(sampled):
+    ''' a fault while heating trips the heater off by the next sample '''
+    api = pighelp.PIGHELPER.Api
+    when = 30.0     # the heater is full on to 220F then
+    caught = []
+    def script(clock):
+        clock.addListener(lambda old, new: setattr(api.thermocouple, 'faults', max31855.FAULT_OC if new >= when else 0))
+        try:
+            control.runScript(clock, sampled=sampled)
+        except control.ThermocoupleFault as ex:
+            caught.append((ex.faults, control.heaterTrip))
+        clock.sleep(1)      # so the plate trace shows the heater after the trip
+    try:
+        plate = simulate.simulate(script)
+    finally:
+        api.thermocouple.faults = 0
+    assert caught == [(max31855.FAULT_OC, max31855.FAULT_OC)]
+    assert any(heat for (t, _, heat, _) in plate.trace if t <= when)
+    # the heat in a trace entry is what was on since the one before, none may run past one sample
+    late = [heat for (t, _, heat, _) in plate.trace if t > when + sampler.CONVERSION + 1e-9]
+    assert late and not any(late)
@@ -0,0 +1,42 @@
+# the pid controller's clamping, anti-windup and bumpless transfer
+#   python3 -m pytest -q
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pidcontrol
+
+def test_clamped():
+    pid = pidcontrol.PidController(4.0, 0.02, 40.0)
+    pid.setSetpoint(400)
+    assert pid.update(70, 0) == 100.0
+    pid.setSetpoint(70)
+    assert pid.update(400, 1) == 0.0
+    # a narrower range
+    pid = pidcontrol.PidController(4.0, 0.02, 0.0, outmin=10.0, outmax=60.0)
+    pid.setSetpoint(300)
+    assert pid.update(100, 0) == 60.0 and pid.update(100, 1) == 60.0
+    pid.setSetpoint(50)
+    assert pid.update(100, 2) == 10.0
+
+def test_no_windup():
+    ''' a long time pinned at full power doesn't leave the integrator holding the output up '''
+    pid = pidcontrol.PidController(4.0, 0.5, 0.0)
+    pid.setSetpoint(400)
+    for step in range(600):
+        assert pid.update(100, step) == 100.0
+    assert pid.integral <= pid.outmax
+    # once past the setpoint the duty comes down at once rather than after unwinding
+    assert pid.update(405, 600) < 100.0
+    assert pid.update(410, 601) == 0.0
+
+def test_bumpless():
+    pid = pidcontrol.PidController(4.0, 0.02, 40.0)
+    pid.setSetpoint(300)
+    pid.update(250, 0)
+    # a new phase takes over at 25% without a jump
+    pid.setSetpoint(320)
+    pid.track(25.0, 300, 10)
+    assert abs(pid.update(300, 10.1) - 25.0) < 0.1
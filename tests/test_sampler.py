@@ -0,0 +1,43 @@
+# the sampler's ring buffer
+#   python3 -m pytest -q
+
+import os
+import sys
+
+os.environ.setdefault('PIGPIO_SIM', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sampler
+
+def fill(buffer, count):
+    for index in range(count):
+        buffer.append(index * 0.1, 70.0 + index, 75.0, index % 2)
+
+def test_empty():
+    buffer = sampler.RingBuffer(8)
+    assert len(buffer) == 0 and buffer.latest() is None
+    assert all(len(item) == 0 for item in buffer.last(5))
+    assert all(len(item) == 0 for item in buffer.window(1.0))
+
+def test_before_wrap():
+    buffer = sampler.RingBuffer(8)
+    fill(buffer, 5)
+    assert len(buffer) == 5
+    assert buffer.latest() == (0.4, 74.0, 75.0, 0)
+    assert list(buffer.last(10)[1]) == [70.0, 71.0, 72.0, 73.0, 74.0]
+
+def test_wraps_in_order():
+    buffer = sampler.RingBuffer(8)
+    fill(buffer, 21)
+    assert len(buffer) == 8
+    assert buffer.latest() == (2.0, 90.0, 75.0, 0)
+    (times, temps, refs, faults) = buffer.last(8)
+    assert list(temps) == [83.0 + index for index in range(8)]
+    assert list(faults) == [(13 + index) % 2 for index in range(8)]
+    assert all(later > earlier for (earlier, later) in zip(times, times[1:]))
+    # asking for more than it holds gives what it holds
+    assert list(buffer.last(100)[1]) == list(temps)
+    assert list(buffer.last(3)[1]) == [88.0, 89.0, 90.0]
+    # the window is measured back from the newest sample
+    assert list(buffer.window(0.25)[1]) == [88.0, 89.0, 90.0]
+    assert list(buffer.window(10.0)[1]) == list(temps)
@@ -0,0 +1,23 @@
+# the simulator has to stay fast enough to run on every change
+#   python3 -m pytest -q
+
+import os
+import sys
+
+os.environ.setdefault('PIGPIO_SIM', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import contextlib
+import io
+import simulate
+
+def test_run_in_budget():
+    ''' a default run, the best of three so a busy machine doesn't fail it '''
+    times = []
+    for _ in range(3):
+        with contextlib.redirect_stdout(io.StringIO()):
+            (plate, elapsed) = simulate.timed()
+        times.append(elapsed)
+    # it ran the whole profile
+    assert plate.trace[-1][0] > 900 and max(item[1] for item in plate.trace) > 190
+    assert min(times) < simulate.BUDGET, "best run {0:.2f} s".format(min(times))
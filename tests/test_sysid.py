@@ -0,0 +1,42 @@
+# the plant fit on a synthetic first order plus dead time trace
+#   python3 -m pytest -q
+
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import sysid
+
+def fopdt(gain, tau, dead, ambient=70.0, h=0.1, seconds=600):
+    ''' (times, duty, temp) of a first order plus dead time plant with the duty stepping every minute '''
+    a = math.exp(-h / tau)
+    delay = int(round(dead / h))
+    steps = [0, 40, 10, 60, 25, 0, 50, 30, 5, 45]
+    times, duty, temp = [], [], []
+    level = ambient
+    for k in range(int(seconds / h)):
+        times.append(k * h)
+        duty.append(steps[int(k * h / 60) % len(steps)])
+        temp.append(level)
+        held = duty[k - delay] if k >= delay else 0
+        level = a * level + gain * (1 - a) * held + ambient * (1 - a)
+    return times, duty, temp
+
+def test_recovers_fopdt():
+    model = sysid.fit(*fopdt(3.0, 40.0, 4.0))
+    assert model.gain == pytest.approx(3.0, rel=1e-3)
+    assert model.tau == pytest.approx(40.0, rel=1e-3)
+    assert model.deadTime == pytest.approx(4.0)
+    assert model.ambient == pytest.approx(70.0, abs=0.1)
+
+def test_bad_traces():
+    with pytest.raises(ValueError):
+        sysid.fit([], [], [])
+    with pytest.raises(ValueError):
+        sysid.fit([0.0, 0.1, 0.2], [50, 50, 50], [70.0, 70.5, 71.0])
+    (times, _, temp) = fopdt(3.0, 40.0, 4.0)
+    with pytest.raises(ValueError):
+        sysid.fit(times, [30] * len(times), temp)
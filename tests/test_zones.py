@@ -0,0 +1,59 @@
+# the zone schedule keeps under the power budget and a thermocouple fault keeps a zone off
+#   python3 -m pytest -q
+
+import os
+import random
+import sys
+
+os.environ.setdefault('PIGPIO_SIM', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import control
+import max31855
+import zones
+from graphicslib import pighelp
+
+def test_schedule_budget():
+    rand = random.Random(22)
+    for _ in range(500):
+        count = rand.randint(1, 4)
+        duties = [rand.choice([0, 100, rand.uniform(0, 100)]) for _ in range(count)]
+        watts = [rand.choice([250, 400, 500, 750, 1000]) for _ in range(count)]
+        budget = rand.choice([500, 600, 800, 1000, 1500])
+        slots = rand.choice([10, 20])
+        plan = zones.schedule(duties, watts, budget, slots)
+        for slot in range(slots):
+            assert sum(watt for (watt, on) in zip(watts, plan) if slot in on) <= budget
+        for (duty, watt, on) in zip(duties, watts, plan):
+            assert on <= set(range(slots))
+            assert len(on) <= int(round(duty * slots / 100.0))
+            assert not on or watt <= budget
+
+def test_schedule_fits():
+    # two 500W zones at half duty share a 500W budget without scaling back
+    plan = zones.schedule([50, 50], [500, 500], 500, 20)
+    assert len(plan[0]) == len(plan[1]) == 10 and not plan[0] & plan[1]
+    # asking for twice the budget scales both back
+    plan = zones.schedule([100, 100], [500, 500], 500, 20)
+    assert len(plan[0]) + len(plan[1]) == 20
+
+def test_fault_keeps_zone_off():
+    api = pighelp.PIGHELPER.Api
+    zone = zones.Zone('left', 2)
+    zone.switch(1)
+    assert zone.state == 1 and api.pwm.duty(2) == 1.0
+    api.thermocouple.faults = max31855.FAULT_OC
+    try:
+        with pytest.raises(control.ThermocoupleFault):
+            zone.readtemp()
+    finally:
+        api.thermocouple.faults = 0
+    assert zone.state == 0 and zone.tripped == max31855.FAULT_OC and api.pwm.duty(2) == 0.0
+    # the runner can't turn it back on until the trip is cleared
+    zone.switch(1)
+    assert zone.state == 0 and api.pwm.duty(2) == 0.0
+    zone.clearTrip()
+    zone.switch(1)
+    assert zone.state == 1
+    zone.switch(0)
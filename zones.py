@@ -0,0 +1,191 @@
+# More than one heater zone from one pi
+# each zone has its own thermocouple (spi channel), heater (pwm channel) and pid controller.
+# One ZoneRunner thread switches all the heaters. Each switching cycle is cut into slots and
+# the zones' on windows are placed around the cycle so the heaters that are on together never
+# draw more than the power budget (a 1000W plate needs 1000W, see the readme). If the zones
+# ask for more energy than the budget allows over a cycle, every duty is scaled back.
+#
+#   import zones
+#   plate = [zones.Zone('left', 2, spi=0, watts=500), zones.Zone('right', 3, spi=1, watts=500)]
+#   zones.runZones(plate, [350, 350], budget=600, limit=300)
+
+import threading
+import clocks
+import control
+import max31855
+import pidcontrol
+import pwmcontrol
+
+class Zone():
+    ''' one heater zone. heater is the PwmControl channel (0...3), spi the thermocouple chip select '''
+    def __init__(self, name, heater, spi=0, watts=500, pid=None):
+        self.name = name
+        self.watts = watts
+        self.heater = pwmcontrol.PwmControl(control.PwmObject, heater)
+        api = control.getApi()
+        self.hspi = control.getSpi() if spi == 0 else api.spi_open(spi, 1000000, 0)
+        self.pid = pid if pid is not None else pidcontrol.PidController()
+        self.duty = 0           # asked for, percent
+        self.delivered = 0      # scheduled in the last cycle, percent
+        self.state = 0
+        self.tripped = 0        # the thermocouple fault bits that tripped the heater off
+        # readtemp runs in the caller's thread and switch in the ZoneRunner's
+        self.lock = threading.Lock()
+
+    def readtemp(self):
+        ''' the thermocouple temperature in F, raises control.ThermocoupleFault on a fault '''
+        temp, _, faults = max31855.decodeFrame(control.readSpi(self.hspi), linear=True)
+        if faults:
+            self.trip(faults)
+            raise control.ThermocoupleFault(faults)
+        return 32 + temp * 9 /5
+
+    def trip(self, faults):
+        ''' turn the heater off and keep it off until clearTrip '''
+        with self.lock:
+            self.tripped = faults
+            self._switch(0)
+
+    def clearTrip(self):
+        with self.lock:
+            self.tripped = 0
+
+    def switch(self, value):
+        with self.lock:
+            self._switch(0 if self.tripped else value)
+
+    def _switch(self, value):
+        if value != self.state:
+            self.heater.setSpeed(100 if value else 0)
+            self.state = value
+
+def schedule(duties, watts, budget, slots):
+    ''' the on slots of each zone for one cycle of slots, a set of slot numbers per zone
+        duties are in percent. Each zone gets one window (wrapping around the end of the cycle)
+        where the load is lowest. A zone that doesn't fit anywhere under the budget gets what does.
+    '''
+    energy = sum(duty * watt for (duty, watt) in zip(duties, watts)) / 100.0
+    scale = min(1.0, budget / energy) if energy > 0 else 1.0
+    load = [0] * slots
+    result = [set() for _ in duties]
+    # the biggest heaters first, they are the hardest to fit
+    for zone in sorted(range(len(duties)), key=lambda z: (-watts[z], -duties[z])):
+        count = int(round(duties[zone] * scale * slots / 100.0))
+        if count <= 0 or watts[zone] > budget:
+            continue
+        if count >= slots:
+            window = list(range(slots))
+        else:
+            start = min(range(slots), key=lambda s: max(load[(s + k) % slots] for k in range(count)))
+            window = [(start + k) % slots for k in range(count)]
+        for slot in window:
+            if load[slot] + watts[zone] <= budget:
+                result[zone].add(slot)
+        # put whatever didn't fit in the emptiest slots left
+        missing = count - len(result[zone])
+        spare = sorted((load[s], s) for s in range(slots) if s not in result[zone] and load[s] + watts[zone] <= budget)
+        for (_, slot) in spare[0:max(0, missing)]:
+            result[zone].add(slot)
+        for slot in result[zone]:
+            load[slot] += watts[zone]
+    return result
+
+class ZoneRunner(threading.Thread):
+    ''' switches the heaters of a list of zones, a new schedule every cycletime seconds '''
+    def __init__(self, zones, budget=1000, cycletime=1, slots=20, clock=None):
+        threading.Thread.__init__(self)
+        self.clock = clock if clock is not None else clocks.CLOCK
+        self.zones = zones
+        self.budget = budget
+        self.cycletime = cycletime
+        self.slots = slots
+        self.lock = threading.Lock()
+        self.running = True
+        self.cycles = 0
+        self.peak = 0           # the most watts switched on at once
+        self.scaled = 0         # cycles that didn't give every zone its duty
+
+    def start(self):
+        ''' attach to the clock before the thread starts sleeping on it '''
+        self.clock.attach()
+        threading.Thread.start(self)
+
+    def setDuty(self, zone, percent):
+        ''' the duty (0...100) for a zone from the next cycle on '''
+        with self.lock:
+            zone.duty = max(0, min(100, percent))
+
+    def run(self):
+        ''' overriden, call start() to run this thread '''
+        try:
+            slot = self.cycletime / self.slots
+            begin = self.clock.monotonic()
+            while self.running:
+                with self.lock:
+                    duties = [zone.duty for zone in self.zones]
+                plan = schedule(duties, [zone.watts for zone in self.zones], self.budget, self.slots)
+                for (zone, slots) in zip(self.zones, plan):
+                    zone.delivered = 100.0 * len(slots) / self.slots
+                if any(zone.delivered < int(round(zone.duty * self.slots / 100.0)) * 100.0 / self.slots
+                       for zone in self.zones):
+                    self.scaled += 1
+                for index in range(self.slots):
+                    if not self.running:
+                        break
+                    # switch off before on so the load never goes over the budget in between
+                    on = [index in slots for slots in plan]
+                    for (zone, value) in zip(self.zones, on):
+                        if not value:
+                            zone.switch(0)
+                    for (zone, value) in zip(self.zones, on):
+                        if value:
+                            zone.switch(1)
+                    self.peak = max(self.peak, sum(zone.watts for zone in self.zones if zone.state))
+                    now = self.clock.monotonic()
+                    deadline = begin + (index + 1) * slot
+                    if now < deadline:
+                        self.clock.sleep(deadline - now)
+                self.cycles += 1
+                begin += self.cycletime
+                if self.clock.monotonic() > begin + self.cycletime:
+                    begin = self.clock.monotonic()  # we lost a whole cycle, start over from now
+        except Exception as ex:
+            print("ZoneRunner error: " + str(ex))
+        for zone in self.zones:
+            zone.switch(0)
+        self.clock.detach()
+
+    def stop(self):
+        self.running = False
+
+    def report(self):
+        return "{0} cycles, peak {1}W of {2}W budget, {3} cycles scaled back".format(
+            self.cycles, self.peak, self.budget, self.scaled)
+
+def runZones(zones, setpoints, budget=1000, limit=600, clock=None):
+    ''' hold each zone at its setpoint (F) for limit seconds under the power budget (watts) '''
+    clock = clock if clock is not None else clocks.CLOCK
+    zrun = ZoneRunner(zones, budget, clock=clock)
+    for (zone, setpoint) in zip(zones, setpoints):
+        zone.clearTrip()
+        zone.pid.reset()
+        zone.pid.setSetpoint(setpoint)
+    zrun.start()
+    started = clock.time()
+    position = 0
+    try:
+        while clock.time() - started < limit:
+            clock.sleep(.1)
+            now = clock.time()
+            temps = [zone.readtemp() for zone in zones]
+            for (zone, temp) in zip(zones, temps):
+                zrun.setDuty(zone, zone.pid.update(temp, now))
+            position = position + 1
+            if not (position % 10):
+                print("{0:.2f} ::: ".format(now - started) +
+                      " ".join("{0} {1} @ {2:.1f}%".format(zone.name, temp, zone.delivered) for (zone, temp) in zip(zones, temps)))
+    finally:
+        zrun.stop()
+        clock.join(zrun)
+    print(zrun.report())
+    return zrun